@@ -0,0 +1,223 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, Tuple
+import cv2
+import numpy as np
+from logger_config import get_logger
+logger = get_logger(__name__)
+CAPTURE_OPTIONS_ENV="OPENCV_FFMPEG_CAPTURE_OPTIONS"
+# OpenCV's own capture option for the decoder's skip_frame: drop every non-key frame
+# (FFmpeg codec options such as skip_frame would only reach avformat_open_input and be ignored)
+KEYFRAME_ONLY_OPTIONS="avdiscard;nonkey"
+DECODE_MODES=("all","keyframes","low_rate")
+_capture_options_lock=threading.Lock()
+STALL_TIMEOUT_S=10.0      # No frame for this long means the stream is gone
+RECONNECT_BASE_S=1.0
+RECONNECT_MAX_S=60.0
+STATUS_CONNECTING="Connecting"
+STATUS_CONNECTED="Connected"
+STATUS_RECONNECTING="Reconnecting"
+STATUS_STOPPED="Stopped"
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: 50-100% of min(max, base * 2^(attempt-1))"""
+    delay = min(RECONNECT_MAX_S, RECONNECT_BASE_S * (2 ** max(0, attempt - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def open_capture(url: str, extra_options: Optional[str] = None) -> cv2.VideoCapture:
+    """
+    Open url with the FFmpeg backend.
+    extra_options ("key;value|key;value") are appended to the process-wide
+    OPENCV_FFMPEG_CAPTURE_OPTIONS only while this capture is being opened.
+    """
+    with _capture_options_lock:
+        if not extra_options:
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        base = os.environ.get(CAPTURE_OPTIONS_ENV)
+        os.environ[CAPTURE_OPTIONS_ENV] = "|".join(opt for opt in (base, extra_options) if opt)
+        try:
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        finally:
+            if base is None:
+                os.environ.pop(CAPTURE_OPTIONS_ENV, None)
+            else:
+                os.environ[CAPTURE_OPTIONS_ENV] = base
+
+
+def decode_settings(camera_config: dict) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Return (target_fps, extra FFmpeg options) for a camera entry.
+    decode_mode "keyframes" decodes I-frames only, "low_rate" retrieves
+    decode_fps frames per second (default 1); target_fps applies otherwise.
+    """
+    mode = str(camera_config.get("decode_mode") or "all").lower()
+    if mode not in DECODE_MODES:
+        logger.warning(f"Unknown decode_mode {mode!r} for {camera_config.get('camera_url')}, decoding all frames")
+        mode = "all"
+    target_fps = float(camera_config.get("target_fps") or 0) or None
+    if mode == "keyframes":
+        return target_fps, KEYFRAME_ONLY_OPTIONS
+    if mode == "low_rate":
+        return float(camera_config.get("decode_fps") or 1.0), None
+    return target_fps, None
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Decode thread for one stream that keeps only the newest frame.
+    The capture is read as fast as the stream delivers so the FFmpeg buffer
+    never backs up; consumers take the latest frame from a one-slot mailbox
+    and every frame overwritten before being taken counts as dropped.
+
+    With target_fps set the grabber only grab()s to keep the stream moving
+    and calls retrieve() (BGR conversion and copy) when a consumer is waiting
+    in read() and at most target_fps times per second; the other frames are
+    counted as skipped.
+
+    A stream that fails to open or stops delivering frames is released and
+    reopened with exponential backoff and jitter; the grabber only closes
+    when stop() is called. Status changes are reported through on_status.
+    """
+    def __init__(self, url: str, target_fps: Optional[float] = None, capture_options: Optional[str] = None,
+                 on_status: Optional[Callable[[str], None]] = None):
+        super().__init__(name=f"FrameGrabber-{url}", daemon=True)
+        self.url = url
+        self.capture_options = capture_options
+        self.target_fps = target_fps if target_fps and target_fps > 0 else None
+        self._interval = 1.0 / self.target_fps if self.target_fps else 0.0
+        self._next_due = 0.0
+        self._waiting = 0    # consumers blocked in read()
+        self._cond = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._seq = 0        # id of the newest frame in the mailbox
+        self._taken = 0      # id of the last frame handed to a consumer
+        self._stop_event = threading.Event()
+        self.closed = False  # set once the stream can no longer deliver frames
+        self.decoded = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.reconnects = 0
+        self.status = ""
+        self.on_status: Optional[Callable[[str], None]] = on_status
+
+    def run(self):
+        attempt = 0
+        try:
+            logger.info(f"Started frame grabber for {self.url}")
+            while not self._stop_event.is_set():
+                self._set_status(STATUS_CONNECTING if attempt == 0 else f"{STATUS_RECONNECTING} (attempt {attempt})")
+                got_frame = self._stream(open_capture(self.url, self.capture_options))
+                if self._stop_event.is_set():
+                    break
+                attempt = 1 if got_frame else attempt + 1
+                delay = backoff_delay(attempt)
+                logger.warning(f"Stream {self.url} lost, reconnecting in {delay:.1f}s (attempt {attempt})")
+                self._set_status(f"{STATUS_RECONNECTING} in {delay:.0f}s (attempt {attempt})")
+                self._stop_event.wait(delay)
+        except Exception as e:
+            logger.exception(f"Error in frame grabber for {self.url}: {e}")
+        finally:
+            with self._cond:
+                self.closed = True
+                self._cond.notify_all()
+            self._set_status(STATUS_STOPPED)
+            logger.info(f"Frame grabber finished for {self.url} "
+                        f"(decoded {self.decoded}, dropped {self.dropped}, skipped {self.skipped}, "
+                        f"reconnects {self.reconnects})")
+
+    def _stream(self, cap: cv2.VideoCapture) -> bool:
+        """Read cap until stopped or stalled; return whether any frame came through"""
+        got_frame = False
+        try:
+            if not cap.isOpened():
+                logger.info(f"Capture not available or closed for {self.url}")
+                return False
+            last_frame = time.monotonic()
+            while not self._stop_event.is_set():
+                try:
+                    if self.target_fps:
+                        ret, frame = self._grab_on_demand(cap)
+                    else:
+                        ret, frame = cap.read()
+                except cv2.error as e:
+                    logger.exception(f"OpenCV read() failed : {e}")
+                    ret, frame = False, None
+                if ret is False:
+                    if time.monotonic() - last_frame > STALL_TIMEOUT_S:
+                        logger.warning(f"No frame from {self.url} for {STALL_TIMEOUT_S:.0f}s")
+                        return got_frame
+                    time.sleep(0.02)
+                    continue
+                last_frame = time.monotonic()
+                if not got_frame:
+                    got_frame = True
+                    if self.status != STATUS_CONNECTED:
+                        if self.status.startswith(STATUS_RECONNECTING):
+                            self.reconnects += 1
+                        self._set_status(STATUS_CONNECTED)
+                if ret:
+                    self._publish(frame)
+            return got_frame
+        finally:
+            try:
+                cap.release()
+            except Exception:
+                pass
+
+    def _set_status(self, status: str):
+        if status == self.status:
+            return
+        self.status = status
+        if self.on_status is not None:
+            try:
+                self.on_status(status)
+            except Exception as e:
+                logger.exception(f"Status callback failed for {self.url}: {e}")
+
+    def _grab_on_demand(self, cap: cv2.VideoCapture) -> Tuple[bool, Optional[np.ndarray]]:
+        """grab() every frame, retrieve() only when a consumer wants one and it is due"""
+        if not cap.grab():
+            return False, None
+        now = time.monotonic()
+        with self._cond:
+            wanted = self._waiting > 0
+        if not wanted or now < self._next_due:
+            self.skipped += 1
+            return None, None
+        self._next_due = max(self._next_due + self._interval, now)
+        return cap.retrieve()
+
+    def _publish(self, frame: np.ndarray):
+        with self._cond:
+            if self._seq > self._taken:
+                self.dropped += 1
+            self._frame = frame
+            self._seq += 1
+            self.decoded += 1
+            self._cond.notify_all()
+
+    def read(self, timeout: Optional[float] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Wait for a frame newer than the last one taken and return it"""
+        with self._cond:
+            self._waiting += 1
+            try:
+                self._cond.wait_for(lambda: self._seq > self._taken or self.closed, timeout)
+            finally:
+                self._waiting -= 1
+            if self._seq <= self._taken:
+                return False, None
+            self._taken = self._seq
+            frame, self._frame = self._frame, None
+            return True, frame
+
+    def stop(self, timeout: Optional[float] = 2.0):
+        """Ask the grabber to stop and wait for it to release the capture"""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+from logger_config import get_logger
+logger = get_logger(__name__)
+DISPATCH_WORKERS=4
+
+
+def berth_key(positionCode: str, stgBin: str) -> str:
+    """Ordering key of a berth: requests for the same positionCode/stgBin never overlap"""
+    return f"{positionCode}/{stgBin}"
+
+
+class HikJob:
+    """One unit of RCS traffic (e.g. the probe and bind of a zone change) and its outcome"""
+    def __init__(self, berth: str, name: str, fn: Callable[..., Any], args: tuple,
+                 callback: Optional[Callable[["HikJob"], None]]):
+        self.berth = berth
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.callback = callback
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        self.queued = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+
+class HikDispatcher(QObject):
+    """
+    Runs RCS requests off the GUI thread.
+    Jobs of one berth run strictly one after another in submission order;
+    different berths run in parallel on a small worker pool. When a job
+    finishes, its callback is invoked on the thread that owns the
+    dispatcher (the GUI thread), through the job_finished signal.
+    """
+    job_finished = pyqtSignal(object)  # HikJob
+
+    def __init__(self, max_workers: int = DISPATCH_WORKERS, parent=None):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="HikDispatcher")
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[HikJob]] = {}
+        self._active = set()   # berths with a job running
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.job_finished.connect(self._deliver)
+
+    def submit(self, berth: str, fn: Callable[..., Any], *args, name: str = "",
+               callback: Optional[Callable[[HikJob], None]] = None) -> HikJob:
+        """Queue fn(*args) behind the other jobs of berth; never blocks"""
+        job = HikJob(berth, name or getattr(fn, "__name__", "job"), fn, args, callback)
+        with self._lock:
+            self._queues.setdefault(berth, deque()).append(job)
+            self.submitted += 1
+            start = berth not in self._active
+            if start:
+                self._active.add(berth)
+        if start:
+            self._pool.submit(self._drain, berth)
+        return job
+
+    def _drain(self, berth: str):
+        """Run the jobs of berth in order until its queue is empty"""
+        while True:
+            with self._lock:
+                queue = self._queues.get(berth)
+                if not queue:
+                    self._queues.pop(berth, None)
+                    self._active.discard(berth)
+                    return
+                job = queue.popleft()
+            job.started = time.monotonic()
+            try:
+                job.result = job.fn(*job.args)
+            except Exception as e:
+                logger.exception(f"HIK job {job.name} for berth {berth} failed: {e}")
+                job.error = e
+            job.finished = time.monotonic()
+            with self._lock:
+                self.completed += 1
+                self.failed += job.error is not None
+            self.job_finished.emit(job)
+
+    def _deliver(self, job: HikJob):
+        if job.callback is None:
+            return
+        try:
+            job.callback(job)
+        except Exception as e:
+            logger.exception(f"Callback of HIK job {job.name} for berth {job.berth} failed: {e}")
+
+    def pending(self) -> int:
+        """Jobs queued or running"""
+        with self._lock:
+            return sum(len(q) for q in self._queues.values()) + len(self._active)
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_shared: Optional[HikDispatcher] = None
+
+
+def shared_dispatcher(max_workers: int = DISPATCH_WORKERS) -> HikDispatcher:
+    """
+    The one dispatcher all RCS traffic goes through, so per-berth ordering
+    holds across windows. Created on first use, from the GUI thread;
+    max_workers only applies then.
+    """
+    global _shared
+    if _shared is None:
+        _shared = HikDispatcher(max_workers=max_workers)
+    return _shared
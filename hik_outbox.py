@@ -0,0 +1,306 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from frame_grabber import backoff_delay
+from hik_dispatcher import HikDispatcher, HikJob
+from logger_config import get_logger
+from requestHIK_bin import transient
+from utils import user_config_path
+logger = get_logger(__name__)
+OUTBOX_FILE="hik_outbox.sqlite3"
+STATUS_PENDING="pending"
+STATUS_DONE="done"
+STATUS_SUPERSEDED="superseded"
+STATUS_FAILED="failed"
+STATUS_CANCELLED="cancelled"
+COALESCE_MS=500        # Default coalescing window of a berth
+STATS_LOG_S=60.0
+FLUSH_INTERVAL_S=0.2   # The writer commits at least this often while events arrive
+FLUSH_BATCH=1000       # and at most this many writes per transaction
+PUMP_INTERVAL_MS=500
+RETENTION_DAYS=7       # Delivered/superseded/cancelled rows older than this are pruned at start-up
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    event_id TEXT PRIMARY KEY,
+    berth TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox(status);
+"""
+
+
+class OutboxEvent:
+    """
+    An intended bind/unbind: the desired state of one berth. state is that
+    desired state and baseline the berth's state before the coalescing
+    window opened; when they are equal the event changes nothing.
+    """
+    __slots__ = ("event_id", "berth", "kind", "payload", "created", "attempts", "state", "baseline", "due")
+
+    def __init__(self, event_id: str, berth: str, kind: str, payload: dict, created: float, attempts: int = 0,
+                 state: Optional[int] = None, baseline: Optional[int] = None, due: float = 0.0):
+        self.event_id = event_id
+        self.berth = berth
+        self.kind = kind
+        self.payload = payload
+        self.created = created
+        self.attempts = attempts
+        self.state = state
+        self.baseline = baseline
+        self.due = due  # time.monotonic() at which the berth's coalescing window closes
+
+
+class HikOutbox(QObject):
+    """
+    Durable outbox in front of the HikDispatcher.
+    Every intended bind/unbind is appended to a SQLite table before it is
+    sent, so nothing is lost while the RCS server is down or the app
+    restarts. Each event carries the full desired state of its berth, so a
+    newer event for a berth supersedes any older undelivered one and only
+    the latest is sent. Delivery is idempotent (handlers probe the server
+    and set the desired state), and replay follows creation order.
+    An event is only sent once its berth's coalescing window (window_s
+    from the first event) has closed; if the berth is then back where it
+    started (e.g. DETECTED -> CLEAR -> DETECTED) nothing is sent at all.
+    Disk writes go through one batched writer thread; append() only
+    touches memory and a queue.
+    """
+    delivered = pyqtSignal(object, object)  # OutboxEvent, handler result
+    backlog_changed = pyqtSignal(int)
+
+    def __init__(self, dispatcher: HikDispatcher, path: Optional[Path] = None, parent=None):
+        super().__init__(parent)
+        self.dispatcher = dispatcher
+        self.path = Path(path) if path else user_config_path(OUTBOX_FILE)
+        self._handlers: Dict[str, Callable[[dict], Any]] = {}
+        self._lock = threading.Lock()
+        self._pending: Dict[str, OutboxEvent] = {}    # berth -> latest undelivered event
+        self._in_flight: Dict[str, OutboxEvent] = {}  # berth -> event being sent
+        self._confirmed: Dict[str, Optional[int]] = {}  # berth -> state of its last delivered event
+        self._writes: queue.Queue = queue.Queue()
+        self._failures = 0
+        self._retry_at = 0.0
+        self.appended = 0
+        self.superseded = 0
+        self.cancelled = 0
+        self.delivered_count = 0
+        self.retries = 0
+        self._stats_logged = time.monotonic()
+        self._stats_appended = 0
+        self._load()
+        self._writer = threading.Thread(target=self._write_loop, name="HikOutboxWriter", daemon=True)
+        self._writer.start()
+        atexit.register(self._stop_writer)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.pump)
+        self._timer.start(PUMP_INTERVAL_MS)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _load(self):
+        """Reload undelivered events (latest per berth) and prune old delivered rows"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM outbox WHERE status IN (?, ?, ?) AND updated < ?",
+                             (STATUS_DONE, STATUS_SUPERSEDED, STATUS_CANCELLED, time.time() - RETENTION_DAYS * 86400))
+                rows = conn.execute("SELECT event_id, berth, kind, payload, created, attempts FROM outbox "
+                                    "WHERE status = ? ORDER BY rowid", (STATUS_PENDING,)).fetchall()
+                stale = []
+                for event_id, berth, kind, payload, created, attempts in rows:
+                    old = self._pending.get(berth)
+                    if old is not None:
+                        stale.append((STATUS_SUPERSEDED, time.time(), old.event_id))
+                    self._pending[berth] = OutboxEvent(event_id, berth, kind, json.loads(payload), created, attempts)
+                conn.executemany("UPDATE outbox SET status = ?, updated = ? WHERE event_id = ?", stale)
+        finally:
+            conn.close()
+        if self._pending:
+            logger.info(f"Outbox {self.path}: replaying {len(self._pending)} undelivered events")
+
+    def register_handler(self, kind: str, handler: Callable[[dict], Any]):
+        """handler(payload) runs on a dispatcher worker; raise HikUnavailable to have the event retried"""
+        self._handlers[kind] = handler
+
+    def append(self, berth: str, kind: str, payload: dict, state: Optional[int] = None,
+               baseline: Optional[int] = None, window_s: float = 0.0) -> OutboxEvent:
+        """
+        Record the intent and schedule its delivery; never waits for the disk
+        or the server. state/baseline are the desired and previous state of
+        the berth (for cancelling out), window_s its coalescing window.
+        """
+        event = OutboxEvent(uuid.uuid4().hex, berth, kind, payload, time.time(), state=state, baseline=baseline,
+                            due=time.monotonic() + max(0.0, window_s))
+        with self._lock:
+            old = self._pending.get(berth)
+            if old is not None:
+                # Still inside the window opened by the first event
+                event.baseline = old.baseline
+                event.due = old.due
+            # While an event is in flight, baseline assumes it succeeds; _on_delivered corrects it if not
+            self._pending[berth] = event
+            self.appended += 1
+            if old is not None:
+                self.superseded += 1
+        self._writes.put(("insert", event))
+        if old is not None:
+            self._writes.put(("status", old.event_id, STATUS_SUPERSEDED, None, old.attempts))
+        elif window_s > 0:
+            QTimer.singleShot(int(window_s * 1000) + 1, self.pump)
+        self.pump()
+        return event
+
+    def pump(self):
+        """Hand every due berth's latest event to the dispatcher (one in flight per berth)"""
+        now = time.monotonic()
+        if now - self._stats_logged >= STATS_LOG_S:
+            self._log_stats(now)
+        if now < self._retry_at:
+            return
+        due = []
+        cancelled = []
+        with self._lock:
+            for berth, event in list(self._pending.items()):
+                if berth in self._in_flight or event.due > now:
+                    continue
+                del self._pending[berth]
+                if event.state is not None and event.state == event.baseline:
+                    cancelled.append(event)
+                else:
+                    self._in_flight[berth] = event
+                    due.append(event)
+            self.cancelled += len(cancelled)
+        for event in cancelled:
+            logger.info(f"Berth {event.berth} is back to state {event.state} within its window, nothing sent")
+            self._writes.put(("status", event.event_id, STATUS_CANCELLED, None, event.attempts))
+        for event in due:
+            self.dispatcher.submit(event.berth, self._deliver, event, name=f"outbox {event.kind}",
+                                   callback=self._on_delivered)
+        if due or cancelled:
+            self.backlog_changed.emit(self.backlog())
+
+    def _log_stats(self, now: float):
+        self._stats_logged = now
+        if self.appended == self._stats_appended:
+            return
+        self._stats_appended = self.appended
+        stats = self.stats()
+        logger.info(f"Outbox: {stats['appended']} events, {stats['delivered']} delivered, "
+                    f"{stats['requests_saved']} not sent ({stats['superseded']} superseded, "
+                    f"{stats['cancelled']} cancelled out), {stats['backlog']} waiting")
+
+    def _deliver(self, event: OutboxEvent):
+        event.attempts += 1
+        handler = self._handlers.get(event.kind)
+        if handler is None:
+            raise KeyError(f"No outbox handler for {event.kind!r}")
+        return handler(event.payload)
+
+    def _on_delivered(self, job: HikJob):
+        event: OutboxEvent = job.args[0]
+        with self._lock:
+            self._in_flight.pop(event.berth, None)
+            if job.error is None:
+                self._confirmed[event.berth] = event.state
+            else:
+                newer = self._pending.get(event.berth)
+                if newer is not None:
+                    # Its baseline counted on this event; fall back to what the server last confirmed
+                    newer.baseline = self._confirmed.get(event.berth)
+        if job.error is None:
+            self._failures = 0
+            self.delivered_count += 1
+            self._writes.put(("status", event.event_id, STATUS_DONE, None, event.attempts))
+            self.delivered.emit(event, job.result)
+        elif transient(job.error):
+            with self._lock:
+                newer = event.berth in self._pending
+                if not newer:
+                    self._pending[event.berth] = event
+            if newer:
+                self._writes.put(("status", event.event_id, STATUS_SUPERSEDED, str(job.error), event.attempts))
+            self._failures += 1
+            self.retries += 1
+            delay = backoff_delay(self._failures)
+            self._retry_at = time.monotonic() + delay
+            logger.warning(f"RCS server unavailable, {self.backlog()} outbox events waiting, retry in {delay:.1f}s")
+        else:
+            # Rejected by the server (4xx) or a bug: retrying would fail the same way
+            logger.error(f"Outbox {event.kind} for {event.berth} failed: {job.error}")
+            self._writes.put(("status", event.event_id, STATUS_FAILED, str(job.error), event.attempts))
+        self.backlog_changed.emit(self.backlog())
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._writes.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + FLUSH_INTERVAL_S
+                while len(batch) < FLUSH_BATCH:
+                    try:
+                        item = self._writes.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._writes.put(None)
+                        break
+                    batch.append(item)
+                try:
+                    with conn:
+                        for op in batch:
+                            if op[0] == "insert":
+                                event = op[1]
+                                conn.execute("INSERT OR IGNORE INTO outbox (event_id, berth, kind, payload, created) "
+                                             "VALUES (?, ?, ?, ?, ?)",
+                                             (event.event_id, event.berth, event.kind,
+                                              json.dumps(event.payload, ensure_ascii=False), event.created))
+                            else:
+                                _, event_id, status, error, attempts = op
+                                conn.execute("UPDATE outbox SET status = ?, error = ?, attempts = ?, updated = ? "
+                                             "WHERE event_id = ?", (status, error, attempts, time.time(), event_id))
+                except sqlite3.Error as e:
+                    logger.exception(f"Writing {len(batch)} outbox records failed: {e}")
+        finally:
+            conn.close()
+
+    def backlog(self) -> int:
+        """Events not yet delivered (waiting or in flight)"""
+        with self._lock:
+            return len(self._pending) + len(self._in_flight)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters since start; requests_saved counts events never sent (each would cost at least one request)"""
+        return {"appended": self.appended, "superseded": self.superseded, "cancelled": self.cancelled,
+                "requests_saved": self.superseded + self.cancelled, "delivered": self.delivered_count,
+                "retries": self.retries, "backlog": self.backlog()}
+
+    def _stop_writer(self):
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join(timeout=5)
+
+    def close(self):
+        """Stop pumping and flush pending writes to disk"""
+        self._timer.stop()
+        self._stop_writer()
@@ -4,8 +4,15 @@ from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QImage, QPixmap
 import cv2
 from pathlib import Path
-from ultralytics import YOLO
 import os
+from inference_backends import BACKENDS, DEFAULT_BACKEND
+from inference_profile import InferenceProfile
+from model_registry import model_registry
+from utils import ensure_user_file
+from logger_config import get_logger
+import json
+logger = get_logger(__name__)
+DEFAULT_PROFILE="Default"
 
 class ImageDisplay(QWidget):
     def __init__(self, parent=None):
@@ -14,6 +21,8 @@ class ImageDisplay(QWidget):
         self.current_index = 0
         self.current_folder = None
         self.model = None
+        self.model_key = None  # (model path, backend, imgsz) the current handle was acquired for
+        self.profile = InferenceProfile()
         self.detection_timer = QTimer()
         self.detection_timer.timeout.connect(self.run_detection)
         self.detection_timer.setInterval(100)  # Run detection every 100ms
@@ -38,6 +47,22 @@ class ImageDisplay(QWidget):
         self.browse_model_button.clicked.connect(self.browse_model)
         model_layout.addWidget(self.browse_model_button)
         
+        # Inference backend selection
+        model_layout.addWidget(QLabel("Backend:"))
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(BACKENDS)
+        self.backend_combo.setCurrentText(DEFAULT_BACKEND)
+        self.backend_combo.currentTextChanged.connect(self.on_backend_changed)
+        model_layout.addWidget(self.backend_combo)
+        
+        # Inference profile of a configured camera (imgsz, conf, iou, classes, max_det, rect)
+        model_layout.addWidget(QLabel("Profile:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem(DEFAULT_PROFILE)
+        self.profile_combo.addItems(self.load_camera_profiles().keys())
+        self.profile_combo.currentTextChanged.connect(self.on_profile_changed)
+        model_layout.addWidget(self.profile_combo)
+        
         controls_layout.addLayout(model_layout)
         layout.addLayout(controls_layout)
         
@@ -77,9 +102,40 @@ class ImageDisplay(QWidget):
         
         if file_path:
             self.model_path.setText(file_path)
-            self.model = None  # Reset model so it will be reloaded with new weights
+            self.release_model()  # Reset model so it will be reloaded with new weights
             if self.image_files:  # Start detection if we have images
                 self.detection_timer.start()
+
+    def on_backend_changed(self, backend):
+        """Reload the model with the selected backend"""
+        self.release_model()
+        if self.image_files and self.model_path.text() != "No model selected":
+            self.detection_timer.start()
+
+    def load_camera_profiles(self):
+        """Return {camera_url: InferenceProfile} for the entries of camera_configs.json"""
+        self.camera_profiles = {}
+        try:
+            with ensure_user_file('camera_configs.json').open('r', encoding="utf-8") as f:
+                configs = json.load(f)
+            for cfg in configs if isinstance(configs, list) else []:
+                self.camera_profiles[cfg["camera_url"]] = InferenceProfile.from_config(cfg)
+        except Exception as e:
+            logger.exception(f"Cannot load camera profiles: {e}")
+        return self.camera_profiles
+
+    def on_profile_changed(self, name):
+        """Run detection with the selected camera's inference profile"""
+        self.profile = self.camera_profiles.get(name, InferenceProfile())
+        if self.image_files and self.model_path.text() != "No model selected":
+            self.detection_timer.start()
+
+    def release_model(self):
+        """Give the model handle back to the shared registry"""
+        if self.model is not None:
+            self.model.dispose()
+        self.model = None
+        self.model_key = None
             
     def run_detection(self):
         """Run object detection on current image"""
@@ -94,16 +150,18 @@ class ImageDisplay(QWidget):
                 self.detection_timer.stop()
                 return
 
-            # Load model if not loaded or model path changed
-            if self.model is None or getattr(self.model, 'model_path', None) != model_path:
-                self.model = YOLO(model_path)
-                self.model.model_path = model_path  # Save path for future checks
+            # Load model if not loaded or model path/backend changed
+            model_key = (model_path, self.backend_combo.currentText(), self.profile.imgsz)
+            if self.model is None or self.model_key != model_key:
+                self.release_model()
+                self.model = model_registry.acquire(*model_key)
+                self.model_key = model_key
 
             # Load and process image
             img_path = str(self.image_files[self.current_index])
             
             # Run detection without saving
-            results = self.model.predict(img_path)
+            results = self.model.predict(img_path, **self.profile.predict_args())
             
             # Get the plotted image directly from results
             if len(results) > 0:
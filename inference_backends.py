@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from logger_config import get_logger
+from utils import user_config_dir
+logger = get_logger(__name__)
+INT8_BACKEND="onnxruntime-int8"  # built by quantize_model.py, never exported on the fly
+BACKENDS=("torch","onnxruntime","openvino",INT8_BACKEND)
+DEFAULT_BACKEND="torch"
+DEFAULT_IMGSZ=640
+# ultralytics export format and the suffix of what it produces
+EXPORT_FORMATS={
+    "onnxruntime": ("onnx", ".onnx"),
+    "openvino": ("openvino", "_openvino_model"),
+    INT8_BACKEND: (None, ".onnx"),
+}
+_export_lock=threading.Lock()
+
+
+def cache_dir() -> Path:
+    d = user_config_dir() / "model_cache"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def normalize_backend(backend: Optional[str]) -> str:
+    backend = str(backend or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown inference backend {backend!r}, using {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return backend
+
+
+def export_path(model_path: str, digest: str, backend: str, imgsz: int) -> Path:
+    """Cache location of the export of model_path for (weights hash, imgsz, backend)"""
+    _, suffix = EXPORT_FORMATS[backend]
+    return cache_dir() / f"{Path(model_path).stem}-{digest[:16]}-{imgsz}-{backend}{suffix}"
+
+
+def validation_path(artifact: Path) -> Path:
+    """Report written by quantize_model.py next to a quantized model"""
+    return artifact.with_name(artifact.name + ".validation.json")
+
+
+def int8_approved(artifact: Path) -> bool:
+    """True if the INT8 model exists and passed validation against the FP32 model"""
+    report = validation_path(artifact)
+    if not artifact.exists() or not report.exists():
+        return False
+    try:
+        with report.open('r', encoding="utf-8") as f:
+            return bool(json.load(f).get("passed"))
+    except Exception as e:
+        logger.warning(f"Cannot read validation report {report}: {e}")
+        return False
+
+
+def ensure_export(model_path: str, digest: str, backend: str, imgsz: int = DEFAULT_IMGSZ) -> str:
+    """
+    Return the path YOLO() should load for backend.
+    torch uses the weights as they are; other backends are exported once
+    into the cache (dynamic batch so the scheduler can batch cameras) and
+    reused on later starts.
+    """
+    if backend == "torch":
+        return model_path
+    target = export_path(model_path, digest, backend, imgsz)
+    if backend == INT8_BACKEND:
+        if not int8_approved(target):
+            raise FileNotFoundError(f"No validated INT8 model at {target}; run quantize_model.py first")
+        return str(target)
+    with _export_lock:
+        if target.exists():
+            return str(target)
+        fmt, _ = EXPORT_FORMATS[backend]
+        logger.info(f"Exporting {model_path} to {backend} (imgsz {imgsz}) -> {target}")
+        started = time.monotonic()
+        exported = Path(YOLO(model_path).export(format=fmt, imgsz=imgsz, dynamic=True, verbose=False))
+        tmp = target.with_name(target.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp) if tmp.is_dir() else tmp.unlink()
+        shutil.move(str(exported), str(tmp))
+        os.replace(tmp, target)
+        logger.info(f"Export to {backend} done in {time.monotonic() - started:.1f}s")
+        return str(target)
+
+
+def load_model(model_path: str, digest: str, backend: str, imgsz: int = DEFAULT_IMGSZ) -> YOLO:
+    """Load (exporting first if needed) a YOLO model for backend"""
+    try:
+        path = ensure_export(model_path, digest, backend, imgsz)
+    except FileNotFoundError as e:
+        if backend != INT8_BACKEND:
+            raise
+        logger.error(f"{e}; falling back to FP32 onnxruntime")
+        backend = "onnxruntime"
+        path = ensure_export(model_path, digest, backend, imgsz)
+    if backend == "torch":
+        model = YOLO(path, verbose=False)
+        model.fuse()
+        return model
+    return YOLO(path, task="detect", verbose=False)
+
+
+def load_frames(folder: str, limit: int = 50) -> List[np.ndarray]:
+    """Read up to limit images from folder (e.g. the ./log_cam snapshots)"""
+    frames = []
+    for ext in ('*.png', '*.jpg', '*.jpeg', '*.bmp'):
+        for path in sorted(Path(folder).glob(ext)):
+            img = cv2.imread(str(path))
+            if img is not None:
+                frames.append(img)
+            if len(frames) >= limit:
+                return frames
+    return frames
+
+
+def compare_backends(model_path: str, frames: List[np.ndarray], backends=BACKENDS, imgsz: int = DEFAULT_IMGSZ,
+                     batch: int = 1, warmup: int = 3, predict_args: Optional[dict] = None) -> Dict[str, dict]:
+    """
+    Run every backend on the same frames and report per-frame latency
+    (mean/p50/p95 in ms) and throughput (frames per second).
+    predict_args (e.g. a camera's InferenceProfile) are passed to every call.
+    """
+    from model_registry import weights_hash
+    digest = weights_hash(model_path)
+    predict_args = {**(predict_args or {}), "imgsz": imgsz}
+    report = {}
+    for backend in backends:
+        try:
+            model = load_model(model_path, digest, backend, imgsz)
+            for frame in frames[:warmup]:
+                model(frame, verbose=False, **predict_args)
+            latencies = []
+            started = time.perf_counter()
+            for i in range(0, len(frames), batch):
+                chunk = frames[i:i + batch]
+                t0 = time.perf_counter()
+                model(chunk, verbose=False, **predict_args)
+                latencies.append((time.perf_counter() - t0) * 1000.0 / len(chunk))
+            total = time.perf_counter() - started
+            report[backend] = {
+                "mean_ms": float(np.mean(latencies)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "fps": len(frames) / total if total > 0 else 0.0,
+            }
+        except Exception as e:
+            logger.exception(f"Backend {backend} failed: {e}")
+            report[backend] = {"error": str(e)}
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare YOLO inference backends on the same frames")
+    p.add_argument("--model", help="Path to the .pt weights (default: model_path of --camera)")
+    p.add_argument("--camera", help="camera_url of a camera_configs.json entry whose inference profile to use")
+    p.add_argument("--frames", default="./log_cam", help="Folder of frames to run on")
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--imgsz", type=int, default=None, help=f"Input size (default: camera profile or {DEFAULT_IMGSZ})")
+    p.add_argument("--batch", type=int, default=1)
+    p.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = p.parse_args()
+    from inference_profile import InferenceProfile, camera_config_for
+    camera = camera_config_for(args.camera) if args.camera else None
+    if args.camera and camera is None:
+        print(f"No camera {args.camera} in camera_configs.json")
+        return 1
+    model_path = args.model or (camera or {}).get("model_path")
+    if not model_path:
+        p.error("--model or --camera is required")
+    profile = InferenceProfile.from_config(camera) if camera else InferenceProfile(imgsz=args.imgsz or DEFAULT_IMGSZ)
+    imgsz = args.imgsz or profile.imgsz
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        print(f"No frames found in {args.frames}")
+        return 1
+    report = compare_backends(model_path, frames, args.backends, imgsz, args.batch,
+                              predict_args=profile.predict_args() if camera else None)
+    print(f"{len(frames)} frames, imgsz {imgsz}, batch {args.batch}" + (f", {profile}" if camera else ""))
+    print(f"{'backend':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'fps':>10}")
+    for backend, stats in report.items():
+        if "error" in stats:
+            print(f"{backend:<12}  failed: {stats['error']}")
+        else:
+            print(f"{backend:<12}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['fps']:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
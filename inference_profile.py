@@ -0,0 +1,67 @@
+import json
+from typing import List, Optional, Tuple
+from inference_backends import DEFAULT_IMGSZ
+from logger_config import get_logger
+from utils import ensure_user_file
+logger = get_logger(__name__)
+PROFILE_KEYS=("imgsz", "conf", "iou", "classes", "max_det", "rect")
+
+
+class InferenceProfile:
+    """
+    Per-camera predict settings handed straight to the model, so class
+    filtering, confidence cut and max_det happen inside NMS instead of in
+    Python afterwards. rect letterboxes to the minimal stride-aligned
+    rectangle instead of a square (torch and dynamic exports only).
+    """
+    def __init__(self, imgsz: int = DEFAULT_IMGSZ, conf: float = 0.25, iou: float = 0.7,
+                 classes: Optional[List[int]] = None, max_det: int = 300, rect: bool = False):
+        self.imgsz = int(imgsz or DEFAULT_IMGSZ)
+        self.conf = float(conf)
+        self.iou = float(iou)
+        self.classes = [int(c) for c in classes] if classes is not None else None
+        self.max_det = int(max_det)
+        self.rect = bool(rect)
+
+    @classmethod
+    def from_config(cls, camera_config: dict) -> "InferenceProfile":
+        """
+        Build the profile of a camera entry. Settings come from its optional
+        inference_profile dict; imgsz falls back to the entry's imgsz and
+        classes to [id_class].
+        """
+        settings = dict(camera_config.get("inference_profile") or {})
+        unknown = set(settings) - set(PROFILE_KEYS)
+        if unknown:
+            logger.warning(f"Ignoring unknown inference_profile keys {sorted(unknown)} "
+                           f"for {camera_config.get('camera_url')}")
+        kwargs = {k: settings[k] for k in PROFILE_KEYS if k in settings}
+        kwargs.setdefault("imgsz", camera_config.get("imgsz") or DEFAULT_IMGSZ)
+        if "classes" not in kwargs and camera_config.get("id_class") is not None:
+            kwargs["classes"] = [int(camera_config["id_class"])]
+        return cls(**kwargs)
+
+    def predict_args(self) -> dict:
+        """Keyword arguments for model.predict()"""
+        return {"imgsz": self.imgsz, "conf": self.conf, "iou": self.iou, "classes": self.classes,
+                "max_det": self.max_det, "rect": self.rect}
+
+    @property
+    def key(self) -> Tuple:
+        """Hashable identity; frames are only batched together under the same profile"""
+        return (self.imgsz, self.conf, self.iou, tuple(self.classes) if self.classes is not None else None,
+                self.max_det, self.rect)
+
+    def __repr__(self) -> str:
+        return "InferenceProfile(" + ", ".join(f"{k}={v!r}" for k, v in self.predict_args().items()) + ")"
+
+
+def camera_config_for(url: str) -> Optional[dict]:
+    """Entry of camera_configs.json (user copy) for url, None if there is none"""
+    path = ensure_user_file('camera_configs.json')
+    with path.open('r', encoding="utf-8") as f:
+        configs = json.load(f)
+    for cfg in configs if isinstance(configs, list) else []:
+        if cfg.get("camera_url") == url:
+            return cfg
+    return None
@@ -0,0 +1,149 @@
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from logger_config import get_logger
+logger = get_logger(__name__)
+
+
+class _Request:
+    """The frames (or crops) of one camera waiting for the next batch"""
+    __slots__ = ("client", "handle", "frames", "profile", "submitted", "done", "results", "error")
+
+    def __init__(self, client, handle, frames: List[np.ndarray], profile=None):
+        self.client = client
+        self.handle = handle
+        self.frames = frames
+        self.profile = profile
+        self.submitted = time.monotonic()
+        self.done = threading.Event()
+        self.results: list = [None] * len(frames)
+        self.error: Optional[Exception] = None
+
+
+class InferenceScheduler:
+    """
+    Central YOLO scheduler shared by all camera threads.
+    Each camera with detection enabled hands in its latest frame with infer();
+    once per tick the scheduler runs one batched call per model on every
+    pending frame and hands each camera back its own Results.
+    A tick fires when every registered camera has a frame pending, when
+    max_batch frames are waiting, or when the oldest frame is deadline_ms old.
+    A camera that skips a frame (see skip()) is not waited for until it
+    submits again.
+    Frames are batched per model and InferenceProfile, whose predict args
+    are passed to the call.
+    """
+    def __init__(self, deadline_ms: float = 40, max_batch: int = 4):
+        self.deadline_s = max(0.0, float(deadline_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self._pending: Dict[object, _Request] = {}
+        self._clients = set()
+        self._idle = set()  # Registered clients that skipped their last frame
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.frames = 0
+
+    def register(self, client):
+        """Count client among the cameras a tick waits for"""
+        with self._cond:
+            self._clients.add(client)
+            self._ensure_started()
+            self._cond.notify_all()
+
+    def unregister(self, client):
+        with self._cond:
+            self._clients.discard(client)
+            self._idle.discard(client)
+            req = self._pending.pop(client, None)
+            self._cond.notify_all()
+        if req is not None:
+            req.error = RuntimeError("client unregistered")
+            req.done.set()
+
+    def skip(self, client):
+        """client will not submit its current frame (motion gate, no zones): do not hold a tick for it"""
+        with self._cond:
+            if client in self._clients and client not in self._idle:
+                self._idle.add(client)
+                self._cond.notify_all()
+
+    def infer(self, client, handle, frame: np.ndarray, timeout: Optional[float] = None, profile=None):
+        """Queue frame for the next batch and block until its Results are ready"""
+        return self.infer_many(client, handle, [frame], timeout, profile)[0]
+
+    def infer_many(self, client, handle, frames: List[np.ndarray], timeout: Optional[float] = None,
+                   profile=None) -> list:
+        """Like infer() for several images of one camera (e.g. zone crops); returns one Results per image"""
+        req = _Request(client, handle, list(frames), profile)
+        with self._cond:
+            self._ensure_started()
+            old = self._pending.get(client)
+            self._pending[client] = req
+            self._idle.discard(client)
+            self._cond.notify_all()
+        if old is not None:
+            old.error = RuntimeError("superseded by a newer frame")
+            old.done.set()
+        if not req.done.wait(timeout):
+            with self._cond:
+                if self._pending.get(client) is req:
+                    del self._pending[client]
+            raise TimeoutError("inference timed out")
+        if req.error is not None:
+            raise req.error
+        return req.results
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="InferenceScheduler", daemon=True)
+            self._thread.start()
+
+    def _ready(self) -> bool:
+        if not self._pending:
+            return False
+        if sum(len(req.frames) for req in self._pending.values()) >= self.max_batch:
+            return True
+        waiting = self._clients - self._idle
+        if waiting and waiting.issubset(self._pending.keys()):
+            return True
+        oldest = min(req.submitted for req in self._pending.values())
+        return time.monotonic() - oldest >= self.deadline_s
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    if self._pending:
+                        oldest = min(req.submitted for req in self._pending.values())
+                        self._cond.wait(max(0.001, oldest + self.deadline_s - time.monotonic()))
+                    else:
+                        self._cond.wait()
+                batch = sorted(self._pending.values(), key=lambda r: r.submitted)
+                self._pending.clear()
+            self._run(batch)
+
+    def _run(self, batch: List[_Request]):
+        groups: Dict[tuple, list] = {}
+        for req in batch:
+            profile_key = req.profile.key if req.profile is not None else None
+            items = groups.setdefault((req.handle.key, profile_key), [])
+            items.extend((req, i) for i in range(len(req.frames)))
+        for items in groups.values():
+            for start in range(0, len(items), self.max_batch):
+                chunk = items[start:start + self.max_batch]
+                handle, profile = chunk[0][0].handle, chunk[0][0].profile
+                predict_args = profile.predict_args() if profile is not None else {}
+                try:
+                    results = handle([req.frames[i] for req, i in chunk], verbose=False, **predict_args)
+                    for (req, i), res in zip(chunk, results):
+                        req.results[i] = res
+                    self.batches += 1
+                    self.frames += len(chunk)
+                except Exception as e:
+                    logger.exception(f"Batched inference failed: {e}")
+                    for req, _ in chunk:
+                        req.error = e
+        for req in batch:
+            req.done.set()
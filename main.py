@@ -360,16 +360,12 @@ def main():
     window.show()
     if args.auto_multicam:
         window.show_multicam_display()
-        def enable_detect_later():
-            try:
-                if args.auto_detect and hasattr(window,"multicam_window"):
-                    multicam=window.multicam_window.centralWidget()
-                    for w in multicam.camera_widgets:
-                        if hasattr(w,"yolo_checkbox") and w.yolo_checkbox.isEnabled():
-                            w.yolo_checkbox.setChecked(True)
-            except Exception as e:
-                print("error")
-        QTimer.singleShot(2000,enable_detect_later)
+        # Each camera switches detection on once its model is loaded and warmed up
+        try:
+            if args.auto_detect and getattr(window,"multicam_window",None):
+                window.multicam_window.centralWidget().enable_detection_when_ready()
+        except Exception as e:
+            logger.exception(f"Error enabling detection: {e}")
     sys.exit(app.exec())
 
 if __name__ == '__main__':
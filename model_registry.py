@@ -0,0 +1,197 @@
+import gc
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+import torch
+from inference_backends import DEFAULT_IMGSZ, load_model, normalize_backend
+from logger_config import get_logger
+logger = get_logger(__name__)
+WARMUP_RUNS=2
+PRELOAD_WORKERS=2
+
+
+def weights_hash(model_path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the sha1 of the weights file content ('' if the file does not exist)"""
+    if not os.path.isfile(model_path):
+        return ''
+    sha = hashlib.sha1()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class _ModelEntry:
+    """One loaded model shared by every handle with the same key"""
+    def __init__(self, key: Tuple, predict_args: dict):
+        self.key = key
+        self.predict_args = predict_args  # defaults for every call (e.g. imgsz of an export)
+        self.model = None
+        self.refcount = 0
+        self.lock = threading.Lock()      # serializes load and inference
+        self.loaded = threading.Event()
+        self.error: Optional[Exception] = None
+        self.warmed = False
+
+
+class ModelHandle:
+    """Thread-safe inference handle on a model owned by the registry"""
+    def __init__(self, registry: "ModelRegistry", entry: _ModelEntry):
+        self._registry = registry
+        self._entry = entry
+        self._disposed = False
+        self._dispose_lock = threading.Lock()
+
+    @property
+    def key(self) -> Tuple:
+        return self._entry.key
+
+    @property
+    def names(self):
+        return self._entry.model.names
+
+    def __call__(self, *args, **kwargs):
+        if self._disposed:
+            raise RuntimeError(f"Model handle for {self._entry.key[0]} already disposed")
+        with self._entry.lock:
+            return self._entry.model(*args, **{**self._entry.predict_args, **kwargs})
+
+    predict = __call__
+
+    def warmup(self, runs: int = WARMUP_RUNS, predict_args: Optional[dict] = None):
+        """Run dummy inferences once per model so the first real frame does not pay for lazy initialization"""
+        entry = self._entry
+        if entry.warmed or runs <= 0:
+            return
+        args = dict(predict_args or {})
+        imgsz = int(args.get("imgsz") or entry.predict_args.get("imgsz") or DEFAULT_IMGSZ)
+        dummy = np.zeros((imgsz, imgsz, 3), np.uint8)
+        started = time.monotonic()
+        for _ in range(runs):
+            self(dummy, verbose=False, **args)
+        entry.warmed = True
+        logger.info(f"Warmed up {entry.key[0]} [{entry.key[2]}] with {runs} runs in {time.monotonic() - started:.1f}s")
+
+    def dispose(self):
+        """Release this handle; the model is freed when the last handle is disposed"""
+        with self._dispose_lock:
+            if self._disposed:
+                return
+            self._disposed = True
+        self._registry._release(self._entry)
+
+
+class ModelRegistry:
+    """
+    Process-wide YOLO model cache keyed by weights path, content hash,
+    backend and (for exported backends) input size.
+    """
+    def __init__(self):
+        self._entries: Dict[Tuple, _ModelEntry] = {}
+        self._hashes: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+        self._preload_pool: Optional[ThreadPoolExecutor] = None
+
+    def _key(self, model_path: str) -> Tuple:
+        path = os.path.abspath(model_path) if os.path.isfile(model_path) else model_path
+        try:
+            stat = os.stat(path)
+            stamp = (path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = (path, 0, 0)
+        with self._lock:
+            digest = self._hashes.get(stamp)
+        if digest is None:
+            digest = weights_hash(path)
+            with self._lock:
+                self._hashes[stamp] = digest
+        return (path, digest)
+
+    def acquire(self, model_path: str, backend: str = "torch", imgsz: int = DEFAULT_IMGSZ) -> ModelHandle:
+        """Return a handle on the model for model_path and backend, loading (or exporting) it on first use"""
+        backend = normalize_backend(backend)
+        imgsz = int(imgsz or DEFAULT_IMGSZ)
+        # A torch model serves any input size; exports are built for one
+        key = self._key(model_path) + (backend, None if backend == "torch" else imgsz)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _ModelEntry(key, {} if backend == "torch" else {"imgsz": imgsz})
+                self._entries[key] = entry
+            entry.refcount += 1
+        with entry.lock:
+            if entry.model is None and entry.error is None:
+                try:
+                    logger.info(f"Loading model {key[0]} (sha1 {key[1][:12]}, backend {backend})")
+                    entry.model = load_model(key[0], key[1], backend, imgsz)
+                except Exception as e:
+                    entry.error = e
+                finally:
+                    entry.loaded.set()
+        if entry.error is not None:
+            self._release(entry)
+            raise entry.error
+        return ModelHandle(self, entry)
+
+    def preload(self, model_path: str, backend: str = "torch", imgsz: int = DEFAULT_IMGSZ,
+                predict_args: Optional[dict] = None, warmup: int = WARMUP_RUNS,
+                callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        Acquire and warm up the model on a background worker.
+        The future's result is a ModelHandle owned by the caller; callback
+        gets the future once it is done (on the worker thread).
+        """
+        with self._lock:
+            if self._preload_pool is None:
+                self._preload_pool = ThreadPoolExecutor(max_workers=PRELOAD_WORKERS, thread_name_prefix="ModelPreload")
+            pool = self._preload_pool
+        future = pool.submit(self._preload, model_path, backend, imgsz, predict_args, warmup)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def _preload(self, model_path: str, backend: str, imgsz: int, predict_args: Optional[dict], warmup: int):
+        handle = self.acquire(model_path, backend, imgsz)
+        try:
+            handle.warmup(warmup, predict_args)
+        except Exception:
+            handle.dispose()
+            raise
+        return handle
+
+    def _release(self, entry: _ModelEntry):
+        with self._lock:
+            entry.refcount -= 1
+            if entry.refcount > 0:
+                return
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+        with entry.lock:
+            model, entry.model = entry.model, None
+        if model is None:
+            return
+        logger.info(f"Freeing model {entry.key[0]}")
+        try:
+            if hasattr(model, 'model') and model.model is not None and hasattr(model.model, 'cpu'):
+                model.model.cpu()
+            model.model = None
+            del model
+            gc.collect()
+            if torch.cuda.is_available():
+                with torch.cuda.device('cuda'):
+                    torch.cuda.empty_cache()
+                    torch.cuda.ipc_collect()
+        except Exception as e:
+            logger.exception(f"Error freeing model {entry.key[0]}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return {"weights path [backend]": number of live handles}"""
+        with self._lock:
+            return {f"{key[0]} [{key[2]}]": entry.refcount for key, entry in self._entries.items()}
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,113 @@
+import time
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from logger_config import get_logger
+logger = get_logger(__name__)
+REPORT_PERIOD_S=60.0
+
+
+class MotionGate:
+    """
+    Cheap change detector deciding whether YOLO has to run on a frame.
+    Frames are downscaled to `width` pixels, converted to gray and compared
+    with the frame the model last saw. A zone is dirty when more than
+    zone_thresh of its pixels changed by more than pixel_thresh. Inference
+    runs when a zone is dirty or max_staleness_s passed since the last run;
+    otherwise the caller reuses its previous zone states.
+    """
+    def __init__(self, url: str, width: int = 160, pixel_thresh: int = 25, zone_thresh: float = 0.02,
+                 max_staleness_s: float = 10.0):
+        self.url = url
+        self.width = max(16, int(width))
+        self.pixel_thresh = int(pixel_thresh)
+        self.zone_thresh = float(zone_thresh)
+        self.max_staleness_s = float(max_staleness_s)
+        self._reference: Optional[np.ndarray] = None
+        self._current: Optional[np.ndarray] = None
+        self._last_inferred = 0.0
+        self._masks_key = None
+        self._names: List[str] = []
+        self._masks: Optional[np.ndarray] = None   # (zones, h, w) bool
+        self._areas: Optional[np.ndarray] = None
+        self.dirty_zones: List[str] = []
+        self.checked = 0
+        self.skipped = 0
+        self.zone_triggers: Dict[str, int] = {}
+        self._last_report = time.monotonic()
+
+    @classmethod
+    def from_config(cls, camera_config: dict) -> Optional["MotionGate"]:
+        """Build the gate from the camera entry's motion_gate option (true or a dict of settings)"""
+        option = camera_config.get("motion_gate")
+        if not option:
+            return None
+        settings = option if isinstance(option, dict) else {}
+        if not settings.get("enabled", True):
+            return None
+        keys = ("width", "pixel_thresh", "zone_thresh", "max_staleness_s")
+        return cls(camera_config["camera_url"], **{k: settings[k] for k in keys if k in settings})
+
+    def _zone_masks(self, zones: dict, shape: Tuple[int, int]):
+        key = (shape, tuple((name, tuple(map(tuple, data['points']))) for name, data in zones.items()))
+        if key == self._masks_key:
+            return
+        h, w = shape
+        names, masks = [], []
+        for name, data in zones.items():
+            mask = np.zeros((h, w), np.uint8)
+            pts = np.array([(x * w, y * h) for x, y in data['points']], np.int32)
+            cv2.fillPoly(mask, [pts], 1)
+            names.append(name)
+            masks.append(mask.astype(bool))
+        self._names = names
+        self._masks = np.stack(masks) if masks else np.zeros((0, h, w), bool)
+        self._areas = np.maximum(self._masks.sum(axis=(1, 2)), 1)
+        self._masks_key = key
+        self.zone_triggers = {name: self.zone_triggers.get(name, 0) for name in names}
+
+    def should_infer(self, frame: np.ndarray, zones: dict, now: Optional[float] = None) -> bool:
+        """Return True if any zone changed since the last inference or the result is too old"""
+        now = time.monotonic() if now is None else now
+        h, w = frame.shape[:2]
+        small_h = max(1, round(h * self.width / w))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.GaussianBlur(cv2.resize(gray, (self.width, small_h), interpolation=cv2.INTER_AREA), (3, 3), 0)
+        self._current = small
+        self.checked += 1
+        self._zone_masks(zones, small.shape)
+        self.dirty_zones = []
+        if self._reference is None or self._reference.shape != small.shape:
+            infer = True
+        else:
+            changed = cv2.absdiff(small, self._reference) > self.pixel_thresh
+            fractions = (self._masks & changed).sum(axis=(1, 2)) / self._areas
+            self.dirty_zones = [name for name, frac in zip(self._names, fractions) if frac > self.zone_thresh]
+            for name in self.dirty_zones:
+                self.zone_triggers[name] += 1
+            infer = bool(self.dirty_zones) or now - self._last_inferred >= self.max_staleness_s
+        if not infer:
+            self.skipped += 1
+        self._report()
+        return infer
+
+    def mark_inferred(self, now: Optional[float] = None):
+        """The model ran on the last checked frame: it becomes the new reference"""
+        self._last_inferred = time.monotonic() if now is None else now
+        self._reference = self._current
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.checked if self.checked else 0.0,
+        }
+
+    def _report(self):
+        now = time.monotonic()
+        if now - self._last_report < REPORT_PERIOD_S:
+            return
+        self._last_report = now
+        stats = self.stats()
+        logger.info(f"Motion gate {self.url}: skipped {stats['skipped']}/{stats['checked']} inferences "
+                    f"({stats['skip_ratio']:.0%}), zone triggers {self.zone_triggers}")
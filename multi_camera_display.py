@@ -7,25 +7,36 @@ import json
 import os
 import torch
 import torch.cuda
-from ultralytics import YOLO
 import datetime
 import time
 import threading
 from queue import Queue
-from typing import Dict, List
+from typing import Dict, List, Optional
 import gc
 import sys
 import datetime
 from logger_config import get_logger
-from requestHIK_bin import HIKSERVER, RequestHIK
-from PyQt6.QtWidgets import QMessageBox
-from utils import random_string, resource_path,ensure_user_file,user_config_path
-import utils
+from requestHIK_bin import HIKSERVER, RequestHIK, HikUnavailable, accepted, BREAKER_CLOSED, BREAKER_OPEN
+from model_registry import model_registry
+from inference_scheduler import InferenceScheduler
+from frame_grabber import FrameGrabber, decode_settings, STATUS_CONNECTED
+from shm_capture import ShmFrameReader, DEFAULT_RING_SLOTS
+from motion_gate import MotionGate
+from roi_crop import ROI_MODES, crop_regions, merge_crop_detections
+from inference_profile import InferenceProfile
+from zone_index import ZoneIndex
+from zone_state_engine import zone_state_engine, vote_settings, EVENT_CHANGED, EVENT_EMPTY
+from hik_dispatcher import shared_dispatcher, berth_key, DISPATCH_WORKERS
+import polygon_store
+from hik_outbox import HikOutbox, COALESCE_MS
+from utils import resource_path,ensure_user_file
 NUMBER_OF_CAMERA=4
 MAX_ROWS=2
 MAX_COLUMNS=2
 CONTAINER_CODE_OUTSIDE="99"
 MAX_FRAME_LOG=5000
+FRAME_LOG_PERIOD_S=8
+KEYFRAME_FPS_ESTIMATE=0.5  # Hikvision default GOP is about 2 seconds
 ERROR="99999"
 logger = get_logger(__name__)
 import yaml
@@ -45,37 +56,78 @@ with open(resource_path(yaml_file), 'r') as file:
     except yaml.YAMLError as e:
         logger.exception(f"Error loading YAML file: {e}")
         sys.exit(1)
-hikserver = HIKSERVER(ip_address=config['rtc']['ip_address'], port=config['rtc']['port'])
+hikserver = HIKSERVER.from_config(config['rtc'])
+# All bind/unbind traffic leaves the GUI thread through this dispatcher
+hik_dispatcher = shared_dispatcher(max_workers=config['rtc'].get('dispatch_workers', DISPATCH_WORKERS))
+hik_outbox = HikOutbox(hik_dispatcher)  # Bind/unbind intents survive RCS outages and restarts
+OUTBOX_ZONE_STATE="zone_state"
+coalesce_ms=config['rtc'].get('coalesce_ms', COALESCE_MS)
+SERVER_STATUS_INTERVAL_MS=1000
+LATENCY_LOG_PERIOD_S=60  # RCS request latency is logged this often
+OUTBOX_ZONE_EMPTY="zone_empty"
+inference_config = config.get('inference') or {}
+inference_scheduler = InferenceScheduler(deadline_ms=inference_config.get('batch_deadline_ms', 40),
+                                         max_batch=inference_config.get('max_batch', 4))
+INFER_TIMEOUT_S=float(inference_config.get('infer_timeout_s', 5))  # A camera gives up on a batch after this long
 
 class CameraThread(QThread):
     frame_ready = pyqtSignal(str, np.ndarray, dict)  # Signal to emit frame and detections
+    status_changed = pyqtSignal(str, str)  # Stream status (connecting, reconnecting, ...)
+    model_ready = pyqtSignal(str, bool, str)  # url, loaded and warmed up, error message
+    zone_events = pyqtSignal(str, list)  # url, ZoneEvents (transitions only) from the zone state engine
 
     def __init__(self, camera_config: dict, polygons: dict):
         super().__init__()
         self.url = camera_config["camera_url"]
         self.model_path = camera_config["model_path"]
+        self.backend = camera_config.get("backend") or "torch"  # torch, onnxruntime, openvino or onnxruntime-int8
         self.class_id = int(camera_config["id_class"])
-        self.model = None
+        # imgsz, conf, iou, classes, max_det and rect passed to the model (classes default to [id_class])
+        self.profile = InferenceProfile.from_config(camera_config)
+        self.imgsz = self.profile.imgsz
+        self.model = None  # Set by the preload worker once loaded and warmed up
+        self.model_loaded=threading.Event()
         self.polygons = polygons
         self.running = True
         self.yolo_enabled = False  # Mặc định tắt YOLO
-        self.cap = None
-        self.skip_frames=2
+        self.grabber = None  # Detection stream (the display stream too unless detect_url is set)
+        # Optional low-resolution substream for detection; camera_url is then only decoded while shown
+        self.detect_url = camera_config.get("detect_url") or None
+        self.display_grabber = None
+        self.display_active=threading.Event()  # Cleared by the widget while its tile is hidden
+        self.display_active.set()
+        self.last_display_frame=None
+        # Frames per second actually retrieved for detection/display (None = every frame)
+        self.target_fps, self.capture_options = decode_settings(camera_config)
+        self.reduced_rate = bool(self.target_fps or self.capture_options)
+        self.skip_frames=1 if self.reduced_rate else 2  # Every frame is precious at a reduced rate
+        self.display_pending=threading.Event()  # Set while the widget has a frame queued
+        # "process" decodes in a worker process and shares frames through a shared-memory ring
+        self.capture_mode=str(camera_config.get("capture_mode") or "thread").lower()
+        self.ring_slots=int(camera_config.get("ring_slots") or DEFAULT_RING_SLOTS)
+        # Skip YOLO while nothing moves in the zones (None when motion_gate is not configured)
+        self.motion_gate=MotionGate.from_config(camera_config)
+        # Run the model on the zones' bounding rectangle ("union") or one crop per zone cluster ("clusters")
+        self.roi_mode=str(camera_config.get("roi_mode") or "full").lower()
+        if self.roi_mode not in ROI_MODES:
+            logger.warning(f"Unknown roi_mode {self.roi_mode!r} for {self.url}, using full frame")
+            self.roi_mode="full"
+        self.roi_margin=float(camera_config.get("roi_margin", 0.05))
         self.frame_count=0
+        self.zone_index=None  # Compiled zones for the detection frame size, rebuilt when polygons change
+        self.last_zone_coverage={}  # Share of each zone covered by its best box on the last detection
         self.last_shape_states = {}  # Store last detection results
-        self.no_empty_states={}
-        self.trigger_once={}
-        self.no_detected_states={}
+        # Debounced zone states live in the shared zone state engine
+        zones=self.polygons.get(self.url, {})
+        self.zone_names=list(zones)
+        self.zone_slots=zone_state_engine.register(self.url, self.zone_names,
+                                                   [vote_settings(zones[name]) for name in self.zone_names])
         self.stop_event=threading.Event()
         self.dispose_lock=threading.Lock()
         self.start_event=threading.Event()
+        self.scheduled=False  # Registered with the shared inference scheduler
+        self.inference_failures=0  # Consecutive failed detections
         # self.mutex=QM
-        if self.url in self.polygons:
-            for shape_name in self.polygons[self.url].keys():
-                # self.no_empty_states[shape_name] = 0
-                self.no_empty_states[shape_name]=None
-                self.no_detected_states[shape_name]=None
-                self.trigger_once[shape_name]=True
     def dispose(self):
         """Cleanup resources properly"""
         # self.running = False
@@ -88,91 +140,105 @@ class CameraThread(QThread):
         with self.dispose_lock:
             self.running=False
             logger.info(f"Disposing resources for camera thread {self.url}")
+        if self.scheduled:
+            inference_scheduler.unregister(self)
+            self.scheduled=False
+        zone_state_engine.unregister(self.url)
         try:
-            if self.cap:
+            if self.grabber:
                 logger.info(f"Releasing camera for {self.url}")
-            try:
-                if hasattr(self.cap,"isOpened") and self.cap.isOpened():
-                    self.cap.release()
-            except Exception:
-                try:
-                    self.cap.release()
-                except Exception:
-                    pass
-            self.cap=None
+                self.grabber.stop()
+                self.grabber=None
+            if self.display_grabber:
+                self.display_grabber.stop()
+                self.display_grabber=None
         except Exception as e:
             logger.exception(f"Error releasing cap for {self.url}: {e}")
-        # Cleanup YOLO model
+        # Release shared YOLO model (freed by the registry when no camera uses it)
         if self.model:
             try:
-                # Unload model from GPU
-                if hasattr(self.model, 'cpu'):
-                    self.model.cpu()
-                if hasattr(self.model, 'model') and self.model.model is not None:
-                    if hasattr(self.model.model, 'cpu'):
-                        self.model.model.cpu()
-                
-                # Clear model
-                self.model.model = None
-                del self.model
+                self.model.dispose()
                 self.model = None
-
-                # Clear CUDA cache
-                if torch.cuda.is_available():
-                    with torch.cuda.device('cuda'):
-                        torch.cuda.empty_cache()
-                        torch.cuda.ipc_collect()
-
             except Exception as e:
                 logger.exception(f"Error disposing YOLO model: {e}")
 
     # Force garbage collection
     gc.collect()
 
+    def preload_model(self):
+        """Load and warm up the model on the registry's background worker; model_ready reports the outcome"""
+        model_registry.preload(self.model_path, self.backend, self.imgsz, self.profile.predict_args(),
+                               callback=self._on_model_preloaded)
+
+    def _on_model_preloaded(self, future):
+        try:
+            handle = future.result()
+        except Exception as e:
+            logger.exception(f"Loading model {self.model_path} for {self.url} failed: {e}")
+            self.model_ready.emit(self.url, False, str(e))
+            return
+        with self.dispose_lock:
+            if not self.running:
+                handle.dispose()  # Disposed while loading
+                return
+            self.model = handle
+            self.model_loaded.set()
+        logger.info(f"Model ready for {self.url}")
+        self.model_ready.emit(self.url, True, "")
+
+    @property
+    def dropped_frames(self) -> int:
+        """Frames decoded but replaced by a newer one before being processed"""
+        return self.grabber.dropped if self.grabber else 0
+
     def run(self):
         try:
             self.start_event.set()
-            self.cap = cv2.VideoCapture(self.url,cv2.CAP_FFMPEG)
-            logger.info(f"Started camera thread for {self.url}")
+            # The grabber reconnects on its own; model and zone state stay with this thread
+            self.grabber = self.create_grabber(self.detect_url or self.url, target_fps=self.target_fps,
+                                               capture_options=self.capture_options,
+                                               on_status=lambda status: self.status_changed.emit(self.url, status))
+            self.grabber.start()
+            logger.info(f"Started camera thread for {self.url} with {self.profile}")
             count=0
             self.running=True
             print(f"RUnning {self.running}")
-            # while self.running and self.cap and self.cap.isOpened():
             while not self.stop_event.is_set():
                 # pass
                 if not self.running:  # Double check running state
                     print("Not run")
                     break
-                if not self.cap or (hasattr(self.cap,'isOpened') and not self.cap.isOpened()):
+                if not self.grabber or self.grabber.closed:
                     logger.info(f"Capture not available or closed for {self.url}, breaking loop")
                     break
-                
-            #     count+=1
-                # x=True if self.cap else False
-                # print(f"Cap {self.url} {count}: {self.cap} {self.running} yes")
-                # print(f"{count} {self.url} Running {self.running} and cap {self.cap} and opened {self.cap.isOpened}")
-                try:
-                    ret, frame = self.cap.read()
-                # print(f"Cap {count}: {self.cap}")
-                    # if self.cap and self.running:
-                    #     ret, frame = self.cap.read()
-                    # else:
-                    #     break
-                except cv2.error as e:
-                    logger.exception(f"OpenCV read() failed : {e}")
-                    print( f"Outer  {self.url} {self.cap.isOpened()}")
-                    if self.stop_event.is_set():
-                        print( f"Inner  {self.url} {self.cap.isOpened()}")
-                        break
-                except Exception as e:
-                    logger.exception(f"Unexpected read() error : {e}")
-                    if self.stop_event.is_set():
-                        break
+                # Nothing would use a frame now: let the grabber skip it without retrieve()
+                if self.target_fps and not self.detect_url and self.display_pending.is_set() \
+                        and not (self.yolo_enabled and (self.frame_count+1)%self.skip_frames==0):
+                    QThread.msleep(5)
+                    continue
+                # Always take the newest decoded frame; older ones are dropped by the grabber
+                ret, frame = self.grabber.read(timeout=0.5)
                 if not ret:
-                    QThread.msleep(20)
                     continue
+                if self.capture_mode == "process":
+                    frame = frame.copy()  # A view into a ring slot the capture process will overwrite
                 self.frame_count+=1
-                do_detect=self.yolo_enabled and (self.frame_count%self.skip_frames==0)
+                # The model is never loaded here; until the preload worker is done there is nothing to run
+                do_detect=self.yolo_enabled and self.model is not None and (self.frame_count%self.skip_frames==0)
+                gated=False
+                if do_detect and self.motion_gate:
+                    zones_changed=self.motion_gate.should_infer(frame, self.polygons.get(self.url, {}))
+                    if not zones_changed and self.last_shape_states:
+                        do_detect=False  # No zone changed: reuse last_shape_states below
+                        gated=True
+                if self.yolo_enabled != self.scheduled:
+                    if self.yolo_enabled:
+                        inference_scheduler.register(self)
+                    else:
+                        inference_scheduler.unregister(self)
+                    self.scheduled=self.yolo_enabled
+                if self.scheduled and (gated or self.model is None):
+                    inference_scheduler.skip(self)  # Other cameras' batches need not wait for this one
                 
                 # Initialize shape_states with all shapes set to 0 (CLEAR)
                 shape_states = {}
@@ -180,34 +246,35 @@ class CameraThread(QThread):
                     for shape_name in self.polygons[self.url].keys():
                         shape_states[shape_name] = 0
                 
+                boxes = []
+                if do_detect and self.model and self.running:
+                    try:
+                        detections = self.detect(frame)
+                        self.inference_failures=0
+                    except Exception as e:
+                        # A failed or timed-out batch costs this frame's detection, not the camera thread
+                        self.inference_failures+=1
+                        if self.inference_failures == 1 or self.inference_failures % 100 == 0:
+                            logger.error(f"Inference failed for {self.url} ({self.inference_failures} in a row), "
+                                         f"reusing the last results: {e}")
+                        do_detect=False
                 if do_detect:  # Chỉ chạy YOLO khi được bật
-                    if self.model is None:  # Load model khi cần
-                        self.model = YOLO(self.model_path, verbose=False)
-                        self.model.fuse()
                     if self.model and self.running:
-                        results = self.model(frame, verbose=False)[0]
-                        h, w = frame.shape[:2]
-                        # no_bobbin=0
-                        # confidences=[]
-                        for r in results.boxes.data:
-                            if not self.running:
-                                break
-
-                            x1, y1, x2, y2, score, class_id = r
-                            # confidences.append((score.item(),class_id)) 
-                            if class_id == self.class_id:  # Bobbin class or Pallet class
-                                # no_bobbin+=1
-                                if self.url in self.polygons:
-                                    for shape_name, points in self.polygons[self.url].items():
-                                        abs_points = [(int(x * w), int(y * h)) for x, y in points['points']]
-                                        polygon = np.array(abs_points, np.int32)
-                                        person_center = ((int(x1) + int(x2)) // 2, (int(y1) + int(y2)) // 2)
-                                        if cv2.pointPolygonTest(polygon, person_center, False) >= 0.6:
-                                            shape_states[shape_name] = 1
-                                        
-
-                                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
-                        # logger.info(f"Number of bobbin: {no_bobbin} with probs {confidences}")
+                        if self.motion_gate:
+                            self.motion_gate.mark_inferred()
+                        if self.profile.classes is not None:  # [id_class] unless the profile lists classes
+                            detections = detections[np.isin(detections[:, 5], self.profile.classes)]
+                        zones = self.polygons.get(self.url)
+                        if zones:
+                            h, w = frame.shape[:2]
+                            self.zone_index = ZoneIndex.for_zones(self.zone_index, zones, w, h)
+                            coverage = self.zone_index.zone_coverage(detections[:, :4])
+                            occupied = self.zone_index.occupied(detections[:, :4], coverage)
+                            self.last_zone_coverage = dict(zip(self.zone_index.names, coverage.tolist()))
+                            for shape_name, hit in zip(self.zone_index.names, occupied):
+                                if hit:
+                                    shape_states[shape_name] = 1
+                        boxes = detections[:, :4].tolist()
                     # Store the detection results for use in skipped frames
                     self.last_shape_states = shape_states.copy()
                     
@@ -216,11 +283,21 @@ class CameraThread(QThread):
                     if self.yolo_enabled and self.last_shape_states:
                         shape_states = self.last_shape_states.copy()
                     # If YOLO is disabled, keep all shapes as 0 (CLEAR)
-                if self.running:
-                    # Emit frame and shape_states, using last_shape_states to fill missing shapes
-                    self.frame_ready.emit(self.url, frame, {**self.last_shape_states, **shape_states})
-                    # Update last_shape_states
-                    self.last_shape_states = shape_states
+                # A result the motion gate reused still stands for this frame: vote it like a detection
+                zone_states = self.update_zone_states(shape_states, sampled=do_detect or gated,
+                                                      coverage=self.last_zone_coverage)
+                display_frame = self.frame_for_display(frame, do_detect)
+                if self.running and display_frame is not None:
+                    # Boxes are in detection-stream pixels; scale them onto the displayed frame
+                    sx = display_frame.shape[1] / frame.shape[1]
+                    sy = display_frame.shape[0] / frame.shape[0]
+                    for x1, y1, x2, y2 in boxes:
+                        cv2.rectangle(display_frame, (int(x1*sx), int(y1*sy)), (int(x2*sx), int(y2*sy)), (255, 0, 0), 2)
+                    # Emit frame with the debounced zone states
+                    self.display_pending.set()
+                    self.frame_ready.emit(self.url, display_frame, zone_states)
+                # Update last_shape_states
+                self.last_shape_states = shape_states
 
         except Exception as e:
             logger.exception(f"Error in camera thread: {e}")
@@ -231,6 +308,74 @@ class CameraThread(QThread):
                 logger.exception(f"Error during final dispose for {self.url}: {e}")
             logger.info(f"Camera thread finished for {self.url}")
 
+    def update_zone_states(self, shape_states: dict, sampled: bool = True, coverage: Optional[dict] = None) -> dict:
+        """
+        Feed this frame's raw zone occupancy (and per-zone coverage) to the
+        zone state engine, emit its events, return debounced states. sampled
+        is False when shape_states were reused from an earlier detection.
+        """
+        if not self.zone_names:
+            return {}
+        observed = np.fromiter((shape_states.get(name, 0) for name in self.zone_names), np.int8, len(self.zone_names))
+        if coverage is not None:
+            coverage = np.fromiter((coverage.get(name, 0.0) for name in self.zone_names), np.float32, len(self.zone_names))
+        events = zone_state_engine.update(self.zone_slots, observed, time.monotonic(),
+                                          enabled=self.yolo_enabled, sampled=sampled, coverage=coverage)
+        if events:
+            self.zone_events.emit(self.url, events)
+        return dict(zip(self.zone_names, zone_state_engine.states(self.zone_slots).tolist()))
+
+    def detect(self, frame: np.ndarray) -> np.ndarray:
+        """Run the model on frame (or on its zone crops) and return (N, 6) x1,y1,x2,y2,score,class in frame pixels"""
+        if self.roi_mode == "full":
+            results = inference_scheduler.infer(self, self.model, frame, timeout=INFER_TIMEOUT_S, profile=self.profile)
+            return results.boxes.data.cpu().numpy()
+        h, w = frame.shape[:2]
+        rects = crop_regions(self.polygons.get(self.url, {}), w, h, self.roi_mode, self.roi_margin)
+        crops = [np.ascontiguousarray(frame[y1:y2, x1:x2]) for x1, y1, x2, y2 in rects]
+        results = inference_scheduler.infer_many(self, self.model, crops, timeout=INFER_TIMEOUT_S, profile=self.profile)
+        return merge_crop_detections([r.boxes.data.cpu().numpy() for r in results], rects)
+
+    def create_grabber(self, url: str, **kwargs):
+        """Latest-frame source for url: a decode thread, or a capture process with capture_mode=process"""
+        if self.capture_mode == "process":
+            return ShmFrameReader(url, slots=self.ring_slots, **kwargs)
+        return FrameGrabber(url, **kwargs)
+
+    def frame_for_display(self, frame: np.ndarray, detected: bool):
+        """
+        Pick the frame to emit for this iteration.
+        Without a detection substream that is the frame itself. Otherwise the
+        main stream is decoded only while the tile is shown; while hidden the
+        detection frame is emitted so the zone state logic keeps running.
+        Returns None when there is nothing new to show.
+        """
+        if not self.detect_url:
+            return frame
+        if not self.display_active.is_set():
+            if self.display_grabber:
+                logger.info(f"Tile hidden, closing display stream {self.url}")
+                self.display_grabber.stop(timeout=0)
+                self.display_grabber=None
+                self.last_display_frame=None
+            return frame
+        if self.display_grabber is None:
+            logger.info(f"Tile shown, opening display stream {self.url}")
+            self.display_grabber=self.create_grabber(self.url)
+            self.display_grabber.start()
+        if self.display_grabber.closed:
+            return frame
+        ret, display_frame = self.display_grabber.read(timeout=0)
+        if ret:
+            if self.capture_mode == "process":
+                display_frame = display_frame.copy()  # Ring slot view, see run()
+            self.last_display_frame=display_frame
+            return display_frame.copy() if detected else display_frame
+        if self.last_display_frame is None:
+            return frame
+        # Keep detection results flowing to the widget even if the main stream is behind
+        return self.last_display_frame.copy() if detected else None
+
     def stop(self):
         """Stop thread and cleanup resources"""
         logger.info(f"Stopping camera thread for {self.url}")
@@ -240,6 +385,7 @@ class CameraThread(QThread):
         # self.requestInterruption()
         # self.start_event.wait(timeout=0.5)
         self.running = False
+        inference_scheduler.unregister(self)  # Wakes a detect() waiting on the scheduler
         try:
             self.wait()
         except Exception:
@@ -258,16 +404,15 @@ class CameraWidget(QWidget):
         self.camera_thread = None
         self.yolo_enabled = False  # Default YOLO state
         self.toggle_enabled=False
+        self.model_ready=False  # Checkbox stays disabled until the model is loaded and warmed up
+        self.auto_detect=False  # Turn detection on as soon as the model is ready
         self.have_camera=have_camera
-        self.previous_states = {}  # Track previous states for change detection
-        # self.no_empty_state_thresh=1000
-        self.no_empty_time_thresh=20
-        self.no_detected_time_thresh=5
         self.is_start=True
         self.init_ui()
         self.busy=False
         self.is_change=False
         self.count=0
+        self.frame_log_stride=self._frame_log_stride(camera_config)
         self.change_count=0
         self.isWrongServer=False
         self.isFalsePos=0
@@ -275,12 +420,25 @@ class CameraWidget(QWidget):
             self.start_camera()
         else:
             self.camera_not_connected()
+    @staticmethod
+    def _frame_log_stride(camera_config: dict) -> int:
+        """Save a frame to ./log_cam about every 8 seconds whatever the decode rate"""
+        target_fps, capture_options = decode_settings(camera_config) if camera_config else (None, None)
+        if target_fps:
+            return max(1, round(FRAME_LOG_PERIOD_S*target_fps))
+        if capture_options:
+            return max(1, round(FRAME_LOG_PERIOD_S*KEYFRAME_FPS_ESTIMATE))
+        return 200
     def dispose(self):
         """Cleanup resources"""
         if self.camera_thread:
             logger.info(f"Disposing camera widget for {self.url}")
             try:
                 self.camera_thread.frame_ready.disconnect(self.update_frame)
+                self.camera_thread.status_changed.disconnect(self.on_stream_status)
+                self.camera_thread.model_ready.disconnect(self.on_model_ready)
+                self.camera_thread.zone_events.disconnect(self.on_zone_events)
+                hik_outbox.delivered.disconnect(self.on_outbox_delivered)
                 self.camera_thread.stop()
                 # self.camera_thread.wait()
                 # self.camera_thread.deleteLater()
@@ -307,9 +465,16 @@ class CameraWidget(QWidget):
         self.yolo_checkbox = QCheckBox("Enable Detection")
         self.yolo_checkbox.setChecked(False)
         self.yolo_checkbox.stateChanged.connect(self.toggle_yolo)
-        self.yolo_checkbox.setEnabled(self.have_camera)
+        self.yolo_checkbox.setEnabled(False)
+        if self.have_camera:
+            self.yolo_checkbox.setText("Loading model...")
         # Create container for checkbox with right alignment
         checkbox_container = QHBoxLayout()
+        if self.have_camera:
+            self.stream_status_label = QLabel()
+            self.stream_status_label.setStyleSheet("QLabel { color: #c05000; font-weight: bold; }")
+            self.stream_status_label.hide()
+            checkbox_container.addWidget(self.stream_status_label)
         checkbox_container.addStretch()
         checkbox_container.addWidget(self.yolo_checkbox)
         self.layout.addLayout(checkbox_container)
@@ -362,13 +527,56 @@ class CameraWidget(QWidget):
         if self.camera_thread:
             self.camera_thread.yolo_enabled = self.yolo_enabled
         if not self.yolo_checkbox.isEnabled():
-            if self.is_polygon_valid():
+            if self.model_ready and self.is_polygon_valid():
                 self.yolo_checkbox.setEnabled(True)
     def start_camera(self):
         print(self.camera_config)
         self.camera_thread = CameraThread(self.camera_config, self.polygons)
         self.camera_thread.frame_ready.connect(self.update_frame)
+        self.camera_thread.status_changed.connect(self.on_stream_status)
+        self.camera_thread.model_ready.connect(self.on_model_ready)
+        self.camera_thread.zone_events.connect(self.on_zone_events)
+        hik_outbox.delivered.connect(self.on_outbox_delivered)
+        self.camera_thread.preload_model()
         self.camera_thread.start()
+        if self.camera_thread.detect_url:
+            self.visibility_timer=QTimer(self)
+            self.visibility_timer.timeout.connect(self.update_display_active)
+            self.visibility_timer.start(500)
+    def on_stream_status(self, url: str, status: str):
+        """Show connection problems in the tile; hide the label once frames flow"""
+        if url != self.url or not hasattr(self,"stream_status_label"):
+            return
+        self.stream_status_label.setText(status)
+        self.stream_status_label.setVisible(status != STATUS_CONNECTED)
+    def on_model_ready(self, url: str, ok: bool, error: str):
+        """Make detection available once the model is warm (and switch it on if requested)"""
+        if url != self.url:
+            return
+        if not ok:
+            self.yolo_checkbox.setText("Model error")
+            self.yolo_checkbox.setToolTip(error)
+            return
+        self.model_ready=True
+        self.yolo_checkbox.setText("Enable Detection")
+        self.yolo_checkbox.setToolTip("")
+        self.yolo_checkbox.setEnabled(self.is_polygon_valid())
+        if self.auto_detect and self.yolo_checkbox.isEnabled():
+            self.yolo_checkbox.setChecked(True)
+    def enable_detection_when_ready(self):
+        """Check Enable Detection now if the model is ready, otherwise as soon as it is"""
+        self.auto_detect=True
+        if self.model_ready and self.yolo_checkbox.isEnabled():
+            self.yolo_checkbox.setChecked(True)
+    def update_display_active(self):
+        """Tell the camera thread whether the main stream is worth decoding"""
+        if not self.camera_thread:
+            return
+        shown=self.isVisible() and not self.window().isMinimized() and not self.visibleRegion().isEmpty()
+        if shown:
+            self.camera_thread.display_active.set()
+        else:
+            self.camera_thread.display_active.clear()
     def is_polygon_valid(self):
         try:
             if self.url not in self.polygons:
@@ -391,34 +599,6 @@ class CameraWidget(QWidget):
         except Exception:
             self.error(f"is polygon valid error: {e}")
             return False
-    def get_info_shape_ctnrcode_bind(self,ctnrType,positionCode,stgBin,ctnrCod=utils.CONTAINER_CODE_OUTSIDE):
-        hikreq = RequestHIK(random_string(8),ctnrType, ctnrCod, \
-                                positionCode, '1',stgBinCode=stgBin)
-        try:
-            result = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-            if result is not None:
-                    if result.status_code == 200:
-                        logger.info(f"Request successful")
-                    else:
-                        logger.error(f"Request failed")
-        except Exception as e:
-            logger.warning(f"Request raised exception: {e}")
-            return None
-        logger.info(result.json())
-        if result.json()["code"]=='0':
-            hikreq = RequestHIK(random_string(8),ctnrType, ctnrCod, \
-                                positionCode, '0',stgBinCode=stgBin)
-            response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-            if response is not None:
-                    if response.status_code == 200:
-                        logger.info(f"Request successful")
-                    else:
-                        logger.error(f"Request failed")
-            return ('','0')
-        elif 'has bind container code' in result.json()['message']:
-            return (result.json()['message'].split()[-1],'1')
-        else:
-            return ('','')
     def on_state_changed(self, camera_url: str, shape_name: str, old_state: int, new_state: int):
         """Xử lý khi có thay đổi state"""
         if camera_url == self.url:
@@ -436,81 +616,59 @@ class CameraWidget(QWidget):
             if not camera_url:
                 logger.warning(f"Camera URL is empty for {shape_name} in {self.url}")
                 return
-            indBind='1' if state_text == "DETECTED" else '0'
-            # if '172.24.24.204' in camera_url or '172.24.24.203' in camera_url:
-            #     print("hello world hihi")
-            #     ctnrcode=str()
-            #     if '172.24.24.204' in camera_url:
-            #         ctnrcode=str(int(shape_name[-1])+10)
-            #     elif '172.24.24.203' in camera_url:
-            #         ctnrcode=str(int(shape_name[-1])+20)
-            #     hikreq = RequestHIK(hikserver.random_string(8),
-            #                                 camera_polygon['ctnrType'],
-            #                             ctnrcode,
-            #                             camera_polygon['positionCode'],
-            #                             indBind,
-            #                             stgBinCode=camera_polygon['stgBin']
-            #             )
-            #     response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-            #     if response is not None:
-            #         if response.status_code == 200:
-            #             logger.info(f"Request successful ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}): {response.json()} with bind {indBind}")
-            #         else:
-            #             logger.error(f"Request failed ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}) with status code {response.status_code}: {response.text}")
-            #     self.polygons[self.url][shape_name]["bind"]=str(new_state)
-            #     self.save_polygons()
-            # else:
-            info=self.get_info_shape_ctnrcode_bind(camera_polygon['ctnrType'],camera_polygon['positionCode'],camera_polygon['stgBin'])
-            print(f"pos code v:{camera_polygon['positionCode']} and stdbin: {camera_polygon['stgBin']} with info: {info} and current status :{state_text}")
-            if info is None and info[1]=='':
-                try:
-                    logger.exception("Error while getting container code!!!")
-                    QMessageBox.critical(self,"Detection Status",
-                                        "Error while getting container code!!!")
-                except Exception:
-                    return
+            # Recorded in the outbox first, then sent by the dispatcher; the result comes back in on_outbox_delivered
+            # Flips that cancel out within the berth's coalescing window are never sent
+            hik_outbox.append(berth_key(camera_polygon['positionCode'], camera_polygon['stgBin']), OUTBOX_ZONE_STATE,
+                              {"camera_url": camera_url, "shape_name": shape_name,
+                               "camera_polygon": dict(camera_polygon), "new_state": new_state},
+                              state=new_state, baseline=old_state,
+                              window_s=float(camera_polygon.get('coalesce_ms', coalesce_ms))/1000.0)
+    @staticmethod
+    def sync_zone_bind(camera_url: str, shape_name: str, camera_polygon: dict, new_state: int):
+        """
+        Dispatcher worker: bring the server in line with new_state for one zone.
+        camera_polygon is a snapshot; returns (url, shape_name, fields to update).
+        Raises HikUnavailable when the server cannot be reached, so the outbox retries.
+        The berth's current state comes from the bind cache; if the server
+        rejects a request made from it, the berth is probed and tried again.
+        """
+        indBind='1' if new_state == 1 else '0'
+        for refresh in (False, True):
+            info=hikserver.get_bind_state(camera_polygon['ctnrType'],camera_polygon['positionCode'],camera_polygon['stgBin'],refresh=refresh)
+            print(f"pos code v:{camera_polygon['positionCode']} and stdbin: {camera_polygon['stgBin']} with info: {info} and current status :{new_state}")
+            if info is None:
+                raise HikUnavailable("Error while getting container code!!!")
+            updates={}
+            response=None
             #When getting bind code in server is 0 
-            if info[1]=='0':
-                if new_state ==1:
-                    ctnrcode=str()
-                    if '172.24.24.202' in camera_url:
-                        ctnrcode=str(int(shape_name[-1])+1000)
-                    elif '172.24.24.203' in camera_url:
-                        ctnrcode=str(int(shape_name[-1])+2000)
-                    elif '172.24.24.204' in camera_url:
-                        ctnrcode=str(int(shape_name[-1])+3000)
-                    elif '172.24.24.205' in camera_url:
-                        ctnrcode=str(int(shape_name[-1])+4000)
-                    hikreq = RequestHIK(hikserver.random_string(8),
-                                            camera_polygon['ctnrType'],
-                                            ctnrcode,
-                                            camera_polygon['positionCode'],
-                                            indBind,
-                                            stgBinCode=camera_polygon['stgBin']
-                            )
-                    response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-                    if response is not None:
-                        if response.status_code == 200:
-                            logger.info(f"Request successful ({ctnrcode},{camera_polygon['positionCode']}): {response.json()} with bind {indBind}")
-                        else:
-                            logger.error(f"Request failed ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}) with status code {response.status_code}: {response.text}")
-                    self.polygons[self.url][shape_name]["bind"]=str(new_state)
-                    self.save_polygons()
-                    # self.isFalsePos+=1
-                    # self.yolo_enabled=False
-                    # self.isWrongServer=True
-                    # self.yolo_checkbox.setChecked(self.yolo_enabled)
-                    # self.yolo_checkbox.setEnabled(self.yolo_enabled)
-                    # try:
-                    #     QMessageBox.warning(self,"Detection Disabled",
-                    #                     f"Information not fullfilled in server. Check information {camera_url}!")
-                    # except Exception:
-                    #     pass
-                    # return
-            
+            if info[1]=='0' and new_state ==1:
+                ctnrcode=str()
+                if '172.24.24.202' in camera_url:
+                    ctnrcode=str(int(shape_name[-1])+1000)
+                elif '172.24.24.203' in camera_url:
+                    ctnrcode=str(int(shape_name[-1])+2000)
+                elif '172.24.24.204' in camera_url:
+                    ctnrcode=str(int(shape_name[-1])+3000)
+                elif '172.24.24.205' in camera_url:
+                    ctnrcode=str(int(shape_name[-1])+4000)
+                hikreq = RequestHIK(hikserver.random_string(8),
+                                        camera_polygon['ctnrType'],
+                                        ctnrcode,
+                                        camera_polygon['positionCode'],
+                                        indBind,
+                                        stgBinCode=camera_polygon['stgBin']
+                        )
+                response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
+                if response is None:
+                    raise HikUnavailable(f"Binding {ctnrcode} to {camera_polygon['positionCode']} failed")
+                else:
+                    if response.status_code == 200:
+                        logger.info(f"Request successful ({ctnrcode},{camera_polygon['positionCode']}): {response.json()} with bind {indBind}")
+                    else:
+                        logger.error(f"Request failed ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}) with status code {response.status_code}: {response.text}")
             #When getting bind code in server is 1
             if info[1]=='1':
-                self.polygons[self.url][shape_name]["ctnrCod"]=''if new_state==0 else info[0]
+                updates["ctnrCod"]='' if new_state==0 else info[0]
                 hikreq = RequestHIK(hikserver.random_string(8),
                                         camera_polygon['ctnrType'],
                                     info[0],
@@ -519,100 +677,76 @@ class CameraWidget(QWidget):
                                     stgBinCode=camera_polygon['stgBin']
                     )
                 response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-                if response is not None:
+                if response is None:
+                    raise HikUnavailable(f"Setting bind {indBind} of {info[0]} on {camera_polygon['positionCode']} failed")
+                else:
                     if response.status_code == 200:
                         logger.info(f"Request successful ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}): {response.json()} with bind {indBind}")
                     else:
                         logger.error(f"Request failed ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}) with status code {response.status_code}: {response.text}")
-            self.polygons[self.url][shape_name]["bind"]=str(new_state)
-            self.save_polygons()
-            
-    def check_changed_state(self,previous_state,current_state,shape_name):
-        # if current_state ==0 :
-        #     if previous_state==1 and self.camera_thread.no_empty_states[shape_name] <self.no_empty_state_thresh:
-        #         self.camera_thread.no_empty_states[shape_name]+=1
-        #         return 1
-        #     return 0
-        # else:
-        #     self.camera_thread.no_empty_states[shape_name]=0
-        #     return 1
-        if current_state==0:
-            if previous_state==1:
-                ts=self.camera_thread.no_empty_states.get(shape_name)
-                now=time.time()
-                if ts is None:
-                    self.camera_thread.no_empty_states[shape_name]=now
-                    return 1
-                else:
-                    if ((now-ts)<self.no_empty_time_thresh and not self.isWrongServer) and self.toggle_enabled:
-                        return 1
-                    if self.isFalsePos==0:
-                        self.isWrongServer=False
-                    else:
-                        self.isFalsePos-=1
-                    self.camera_thread.no_empty_states[shape_name]=None
-                    return 0
-            return 0
-        else:
-            self.camera_thread.no_empty_states[shape_name]=None
-            return 1
-    def check_empty_state(self,current_state,shape_name):
-        if current_state==0:
-            ts=self.camera_thread.no_detected_states.get(shape_name)
-            now=time.time()
-            if ts is None:
-                self.camera_thread.no_detected_states[shape_name]=now
-                return False
+            if response is None or accepted(response) or refresh:
+                break
+            # Rejected: the cached state was stale (bound/unbound elsewhere), probe the berth and retry once
+            logger.warning(f"Bind state of {camera_polygon['positionCode']} conflicts with the server, probing again")
+        updates["bind"]=str(new_state)
+        return camera_url, shape_name, updates
+    def on_outbox_delivered(self, event, result):
+        """GUI thread: store what a delivered outbox event changed on the server"""
+        url, shape_name, updates = result
+        if url != self.url:
+            return
+        if url in self.polygons and shape_name in self.polygons[url]:
+            self.polygons[url][shape_name].update(updates)
+            self.save_polygons({(url, shape_name): updates})
+    def on_zone_events(self, url: str, events: list):
+        """Act on the transitions reported by the zone state engine"""
+        if url != self.url or not self.yolo_enabled:
+            return
+        for event in events:
+            if event.kind == EVENT_EMPTY:
+                self.on_zone_empty(url, event.zone)
+            elif event.kind == EVENT_CHANGED:
+                logger.info(f"Zone {event.zone} of {url}: {event.old_state} -> {event.new_state} (coverage {event.coverage:.0%})")
+                self.is_change=True
+                self.on_state_changed(url, event.zone, event.old_state, event.new_state)
+    def on_zone_empty(self, url: str, shape_name: str):
+        """Zone stayed empty after start-up: unbind whatever the server still has bound to it"""
+        camera_polygon = self.polygons[url][shape_name]
+        hik_outbox.append(berth_key(camera_polygon['positionCode'], camera_polygon['stgBin']), OUTBOX_ZONE_EMPTY,
+                          {"url": url, "shape_name": shape_name, "camera_polygon": dict(camera_polygon)})
+    @staticmethod
+    def unbind_empty_zone(url: str, shape_name: str, camera_polygon: dict):
+        """Dispatcher worker for on_zone_empty; returns (url, shape_name, fields to update)"""
+        info=hikserver.get_bind_state(camera_polygon['ctnrType'],camera_polygon['positionCode'],camera_polygon['stgBin'])
+        if info is None:
+            raise HikUnavailable(f"Error getting container code of {camera_polygon['positionCode']}")
+        if info[1]=='1':
+            hikreq = RequestHIK(hikserver.random_string(8),
+                                camera_polygon['ctnrType'],
+                            info[0],
+                            camera_polygon['positionCode'],
+                            '0',
+                            stgBinCode=camera_polygon['stgBin']
+            )
+            response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
+            if response is None:
+                raise HikUnavailable(f"Unbinding {info[0]} from {camera_polygon['positionCode']} failed")
             else:
-                if (now-ts)<self.no_detected_time_thresh:
-                    return False
-                self.camera_thread.no_detected_states[shape_name]=None
-                return True
-        return False
+                if response.status_code == 200:
+                    logger.info(f"Request successful ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}): {response.json()} with bind 0 with container code : {info[0]}")
+                else:
+                    logger.error(f"Request failed ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}) with status code {response.status_code}: {response.text}")
+        return url, shape_name, {"ctnrCod": '', "bind": '0'}
     def update_frame(self, url: str, frame: np.ndarray, shape_states: dict):
         if url != self.url:
             return
+        if self.camera_thread:
+            self.camera_thread.display_pending.clear()
         if self.busy:
             return
         self.busy=True
         if self.is_start:
             self.is_start=False
-        # Check for state changes and call on_state_changed
-        for shape_name, current_state in shape_states.items():
-            previous_state = self.previous_states.get(shape_name, 0)
-            current_state=self.check_changed_state(previous_state,current_state,shape_name)
-            shape_states[shape_name]=current_state
-            if self.camera_thread.trigger_once[shape_name] and self.yolo_enabled:
-                if self.check_empty_state(current_state,shape_name) :
-                    camera_polygon = self.polygons[url][shape_name]
-                    try:
-                        info=self.get_info_shape_ctnrcode_bind(camera_polygon['ctnrType'],camera_polygon['positionCode'],camera_polygon['stgBin'])
-                    except Exception as e:
-                        logger.error(f"Error : current ctnrType: {camera_polygon['ctnrType']}")
-                    if info[1]=='1':
-                        hikreq = RequestHIK(hikserver.random_string(8),
-                                            camera_polygon['ctnrType'],
-                                        info[0],
-                                        camera_polygon['positionCode'],
-                                        '0',
-                                        stgBinCode=camera_polygon['stgBin']
-                        )
-                        response = hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-                        if response is not None:
-                            if response.status_code == 200:
-                                logger.info(f"Request successful ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}): {response.json()} with bind 0 with container code : {info[0]}")
-                            else:
-                                logger.error(f"Request failed ({camera_polygon['ctnrCod']},{camera_polygon['positionCode']}) with status code {response.status_code}: {response.text}")
-                    self.camera_thread.trigger_once[shape_name]=False
-                    self.polygons[url][shape_name]["ctnrCod"]=''
-                    self.polygons[url][shape_name]["bind"]='0'
-                    self.save_polygons()
-            if current_state != previous_state:
-                # logger.info(f"on_state_changed {url}-{shape_name}-{previous_state}-{current_state}")
-                if self.yolo_enabled:
-                    self.is_change=True
-                    # logger.info(f"on_state_changed {url}-{shape_name}-{previous_state}-{current_state}")
-                    self.on_state_changed(url, shape_name, previous_state, current_state)
         if self.count >=MAX_FRAME_LOG and self.is_change:
             self.count=0
         if self.is_change:
@@ -620,11 +754,8 @@ class CameraWidget(QWidget):
             self.change_count+=1
         if self.count <MAX_FRAME_LOG  :
             self.count+=1
-            if self.count % 200==0:
+            if self.count % self.frame_log_stride==0:
                 cv2.imwrite(os.path.join("./log_cam",f"frame_{url[22:35]}_{self.change_count}_{self.count}.png"),frame)
-        # Update previous states
-        self.previous_states = shape_states.copy()
-
         # Convert frame to RGB for Qt
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         h, w, ch = rgb_frame.shape
@@ -680,19 +811,15 @@ class CameraWidget(QWidget):
         )
         self.video_label.setPixmap(scaled_pixmap)
         self.busy=False
-    def save_polygons(self):
-        """Save polygons to JSON file"""
+    def save_polygons(self, updates: dict):
+        """Save the changed fields of some shapes; the rest of the file (e.g. the editor's zones) is left as saved"""
         try:
-            path=user_config_path('camera_polygons.json')
-            tmp=path.with_suffix(".json.tmp")
-            with tmp.open('w',encoding="utf-8") as f:
-                json.dump(self.polygons, f, ensure_ascii=False,indent=2)
-            tmp.replace(path)
-            # with open(resource_path('camera_polygons.json'), 'w') as f:
-            #     json.dump(self.polygons, f, indent=2)
+            polygon_store.update_shapes(updates)
             logger.info("Polygons saved successfully")
         except Exception as e:
             logger.exception(f"Error saving polygons: {e}")
+hik_outbox.register_handler(OUTBOX_ZONE_STATE, lambda payload: CameraWidget.sync_zone_bind(**payload))
+hik_outbox.register_handler(OUTBOX_ZONE_EMPTY, lambda payload: CameraWidget.unbind_empty_zone(**payload))
 class MultiCameraDisplay(QWidget):
     def __init__(self, camera_configs: List[dict], parent=None):
         super().__init__(parent)
@@ -704,6 +831,12 @@ class MultiCameraDisplay(QWidget):
     def dispose(self):
         """Cleanup all resources"""
         logger.info("Starting MultiCameraDisplay cleanup")
+        if hasattr(self, 'server_status_timer'):
+            self.server_status_timer.stop()
+            try:
+                hik_outbox.backlog_changed.disconnect(self.update_server_status)
+            except TypeError:
+                pass  # Already disconnected by an earlier dispose
         
         # Stop and cleanup all camera widgets
         for widget in self.camera_widgets:
@@ -727,6 +860,12 @@ class MultiCameraDisplay(QWidget):
             logger.error("Error in clearn multi camera: {e}")
         logger.info("MultiCameraDisplay cleanup completed")
 
+    def enable_detection_when_ready(self):
+        """Turn detection on for every camera as its model becomes ready"""
+        for widget in self.camera_widgets:
+            if widget.have_camera:
+                widget.enable_detection_when_ready()
+
     def closeEvent(self, event):
         logger.info("MultiCameraDisplay closing...")
         self.dispose()
@@ -772,3 +911,37 @@ class MultiCameraDisplay(QWidget):
             row_idx=i//MAX_ROWS
             column_idx=i%MAX_COLUMNS
             self.grid_layout.addWidget(camera_widget, row_idx, column_idx)
+
+        # Status bar: RCS server circuit state and outbox backlog
+        self.server_status_label = QLabel()
+        self.layout.addWidget(self.server_status_label)
+        self.server_status_timer = QTimer(self)
+        self.server_status_timer.timeout.connect(self.update_server_status)
+        self.server_status_timer.start(SERVER_STATUS_INTERVAL_MS)
+        self.latency_logged_at=time.monotonic()
+        hik_outbox.backlog_changed.connect(self.update_server_status)
+        self.update_server_status()
+
+    def update_server_status(self, *_):
+        """Show whether the RCS server is reachable, so server outages are not mistaken for camera faults"""
+        state = hikserver.breaker.state
+        server = f"RCS server {hikserver.ip_address}:{hikserver.port}"
+        if state == BREAKER_CLOSED:
+            text, color = f"{server}: OK", "#e8f5e9"
+        elif state == BREAKER_OPEN:
+            retry_in = hikserver.breaker.retry_in()
+            retry = f"retry in {retry_in:.0f}s" if retry_in > 0 else "retrying with the next request"
+            text, color = f"{server}: NOT RESPONDING, {retry} (cameras unaffected)", "#ffcdd2"
+        else:
+            text, color = f"{server}: testing connection...", "#fff9c4"
+        stats = hikserver.latency_stats()
+        if "p95_ms" in stats:
+            text += f" | p95 {stats['p95_ms']:.0f} ms"
+        backlog = hik_outbox.backlog()
+        if backlog:
+            text += f" | {backlog} bind/unbind waiting"
+        if time.monotonic() - self.latency_logged_at >= LATENCY_LOG_PERIOD_S:
+            self.latency_logged_at=time.monotonic()
+            logger.info(f"RCS server stats: {stats}")
+        self.server_status_label.setText(text)
+        self.server_status_label.setStyleSheet(f"QLabel {{ padding: 5px; border: 1px solid #ccc; background-color: {color}; }}")
@@ -0,0 +1,58 @@
+import json
+import threading
+from typing import Collection, Dict, Tuple
+from logger_config import get_logger
+from utils import ensure_user_file, user_config_path
+logger = get_logger(__name__)
+POLYGONS_FILE="camera_polygons.json"
+RUNTIME_FIELDS=("ctnrCod","bind")  # Written from server answers by whichever window talks to the RCS
+_lock=threading.Lock()
+
+
+def _read() -> dict:
+    path = ensure_user_file(POLYGONS_FILE)
+    with path.open('r', encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write(polygons: dict):
+    path = user_config_path(POLYGONS_FILE)
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open('w', encoding="utf-8") as f:
+        json.dump(polygons, f, ensure_ascii=False, indent=2)
+    tmp.replace(path)
+
+
+def save_polygons(polygons: dict, fresh: Collection[Tuple[str, str]] = ()):
+    """
+    Write a window's full copy of the zones to camera_polygons.json.
+    The file is read again first: for shapes present in both, the runtime
+    fields (ctnrCod, bind) already saved by the other window are kept,
+    except for the (url, shape) pairs in fresh, which the caller has just
+    set itself. polygons is updated in place with the kept values.
+    """
+    with _lock:
+        try:
+            current = _read()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not re-read {POLYGONS_FILE} before saving: {e}")
+            current = {}
+        for url, shapes in polygons.items():
+            for name, data in shapes.items():
+                saved = current.get(url, {}).get(name)
+                if saved is None or (url, name) in fresh:
+                    continue
+                for field in RUNTIME_FIELDS:
+                    if field in saved:
+                        data[field] = saved[field]
+        _write(polygons)
+
+
+def update_shapes(updates: Dict[Tuple[str, str], dict]):
+    """Set fields of individual (url, shape) entries in camera_polygons.json, leaving everything else as saved"""
+    with _lock:
+        current = _read()
+        for (url, name), fields in updates.items():
+            if name in current.get(url, {}):
+                current[url][name].update(fields)
+        _write(current)
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+from inference_backends import (DEFAULT_IMGSZ, INT8_BACKEND, ensure_export, export_path, load_frames,
+                                validation_path)
+from inference_profile import InferenceProfile, camera_config_for
+from logger_config import get_logger
+from model_registry import weights_hash
+logger = get_logger(__name__)
+MATCH_IOU=0.5
+MIN_RECALL=0.95      # share of FP32 detections the INT8 model must reproduce
+MIN_PRECISION=0.90   # share of INT8 detections that must exist in the FP32 output
+
+
+def preprocess(frame: np.ndarray, imgsz: int) -> np.ndarray:
+    """Letterbox a BGR frame the way ultralytics does and return a (1, 3, imgsz, imgsz) float32 tensor"""
+    img = LetterBox(new_shape=(imgsz, imgsz), auto=False)(image=frame)
+    img = img[..., ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(img, dtype=np.float32)[None] / 255.0
+
+
+class FrameCalibrationReader:
+    """onnxruntime CalibrationDataReader over saved camera frames"""
+    def __init__(self, frames: List[np.ndarray], input_name: str, imgsz: int):
+        self._frames = frames
+        self._input_name = input_name
+        self._imgsz = imgsz
+        self._index = 0
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        if self._index >= len(self._frames):
+            return None
+        frame = self._frames[self._index]
+        self._index += 1
+        return {self._input_name: preprocess(frame, self._imgsz)}
+
+    def rewind(self):
+        self._index = 0
+
+
+def quantize(fp32_path: str, int8_path: Path, frames: List[np.ndarray], imgsz: int,
+             exclude_nodes: Optional[List[str]] = None):
+    """Statically quantize fp32_path to int8_path (QDQ, per-channel weights) calibrated on frames"""
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class _Reader(FrameCalibrationReader, CalibrationDataReader):
+        pass
+
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    source = fp32_path
+    prepared = int8_path.with_name(int8_path.name + ".prep.onnx")
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(fp32_path, str(prepared))
+        source = str(prepared)
+    except Exception as e:
+        logger.warning(f"Quantization pre-processing skipped: {e}")
+    tmp = int8_path.with_name(int8_path.name + ".tmp")
+    try:
+        quantize_static(source, str(tmp), _Reader(frames, input_name, imgsz),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        nodes_to_exclude=exclude_nodes or [])
+        os.replace(tmp, int8_path)
+    finally:
+        for path in (prepared, tmp):
+            if path.exists():
+                path.unlink()
+
+
+def _boxes(result) -> np.ndarray:
+    return result.boxes.data.cpu().numpy() if result.boxes is not None else np.zeros((0, 6), np.float32)
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def compare_detections(reference: List[np.ndarray], candidate: List[np.ndarray], iou_thresh: float = MATCH_IOU) -> dict:
+    """Greedy same-class IoU matching of candidate detections against reference ones, frame by frame"""
+    matched = ref_total = cand_total = same_count = 0
+    ious = []
+    for ref, cand in zip(reference, candidate):
+        ref_total += len(ref)
+        cand_total += len(cand)
+        same_count += len(ref) == len(cand)
+        if not len(ref) or not len(cand):
+            continue
+        iou = _iou(ref[:, :4], cand[:, :4])
+        iou[ref[:, None, 5] != cand[None, :, 5]] = 0
+        while True:
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[i, j] < iou_thresh:
+                break
+            matched += 1
+            ious.append(float(iou[i, j]))
+            iou[i, :] = 0
+            iou[:, j] = 0
+    return {
+        "frames": len(reference),
+        "fp32_detections": ref_total,
+        "int8_detections": cand_total,
+        "matched": matched,
+        "recall": matched / ref_total if ref_total else 1.0,
+        "precision": matched / cand_total if cand_total else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "same_count_ratio": same_count / len(reference) if reference else 0.0,
+    }
+
+
+def validate(fp32_path: str, int8_path: Path, frames: List[np.ndarray], profile: InferenceProfile) -> dict:
+    """Run both models on frames with the camera's profile and compare what they detect"""
+    predict_args = profile.predict_args()
+    report = {}
+    detections = {}
+    for name, path in (("fp32", fp32_path), ("int8", str(int8_path))):
+        model = YOLO(path, task="detect", verbose=False)
+        boxes = []
+        started = time.perf_counter()
+        for frame in frames:
+            boxes.append(_boxes(model(frame, verbose=False, **predict_args)[0]))
+        elapsed = time.perf_counter() - started
+        report[f"{name}_ms_per_frame"] = elapsed * 1000.0 / len(frames) if frames else 0.0
+        detections[name] = boxes
+    report.update(compare_detections(detections["fp32"], detections["int8"]))
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description="Build an INT8 onnxruntime model calibrated on saved camera frames")
+    p.add_argument("--model", help="Path to the .pt weights (default: model_path of --camera)")
+    p.add_argument("--camera", help="camera_url of a camera_configs.json entry whose inference profile to use")
+    p.add_argument("--frames", default="./log_cam", help="Folder of saved frames used for calibration and validation")
+    p.add_argument("--limit", type=int, default=300)
+    p.add_argument("--val-every", type=int, default=5, help="Hold out every Nth frame for validation")
+    p.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Input size when --camera is not given")
+    p.add_argument("--conf", type=float, default=0.25, help="Confidence when --camera is not given")
+    p.add_argument("--class-id", type=int, default=None, help="Only compare this class when --camera is not given")
+    p.add_argument("--min-recall", type=float, default=MIN_RECALL)
+    p.add_argument("--min-precision", type=float, default=MIN_PRECISION)
+    p.add_argument("--exclude-nodes", nargs="*", default=[], help="ONNX nodes to keep in FP32 (e.g. the detect head)")
+    args = p.parse_args()
+    camera = camera_config_for(args.camera) if args.camera else None
+    if args.camera and camera is None:
+        print(f"No camera {args.camera} in camera_configs.json")
+        return 1
+    model_path = args.model or (camera or {}).get("model_path")
+    if not model_path:
+        p.error("--model or --camera is required")
+    if camera:
+        profile = InferenceProfile.from_config(camera)
+    else:
+        profile = InferenceProfile(imgsz=args.imgsz, conf=args.conf,
+                                   classes=[args.class_id] if args.class_id is not None else None)
+    imgsz = profile.imgsz
+
+    frames = load_frames(args.frames, args.limit)
+    val_every = max(2, args.val_every)
+    validation = frames[::val_every]
+    calibration = [f for i, f in enumerate(frames) if i % val_every]
+    if not calibration or not validation:
+        print(f"Need at least {val_every} frames in {args.frames}, found {len(frames)}")
+        return 1
+
+    digest = weights_hash(model_path)
+    if not digest:
+        print(f"Weights not found: {model_path}")
+        return 1
+    fp32_path = ensure_export(model_path, digest, "onnxruntime", imgsz)
+    int8_path = export_path(model_path, digest, INT8_BACKEND, imgsz)
+    report_path = validation_path(int8_path)
+    if report_path.exists():
+        report_path.unlink()  # a new model is not approved until validated again
+
+    print(f"Calibrating on {len(calibration)} frames, validating on {len(validation)}")
+    started = time.monotonic()
+    quantize(fp32_path, int8_path, calibration, imgsz, args.exclude_nodes)
+    logger.info(f"INT8 model written to {int8_path} in {time.monotonic() - started:.1f}s")
+
+    report = validate(fp32_path, int8_path, validation, profile)
+    report.update({
+        "model": os.path.abspath(model_path),
+        "sha1": digest,
+        "profile": profile.predict_args(),
+        "calibration_frames": len(calibration),
+        "min_recall": args.min_recall,
+        "min_precision": args.min_precision,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    report["passed"] = report["recall"] >= args.min_recall and report["precision"] >= args.min_precision
+    with report_path.open('w', encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"FP32 {report['fp32_ms_per_frame']:.1f} ms/frame, INT8 {report['int8_ms_per_frame']:.1f} ms/frame")
+    print(f"recall {report['recall']:.3f}, precision {report['precision']:.3f}, mean IoU {report['mean_iou']:.3f} "
+          f"over {report['fp32_detections']} FP32 detections")
+    if report["passed"]:
+        print(f"Approved: cameras may use \"backend\": \"{INT8_BACKEND}\" with imgsz {imgsz}")
+        return 0
+    print(f"Rejected: INT8 detections differ too much from FP32; see {report_path}")
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
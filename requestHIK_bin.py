@@ -1,10 +1,193 @@
 import requests
+from requests.adapters import HTTPAdapter
 import datetime
 import json
 import random
-from utils import random_string
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Optional, Tuple
+import numpy as np
+from utils import random_string, CONTAINER_CODE_OUTSIDE
 from logger_config import get_logger
 logger = get_logger(__name__)
+CONNECT_TIMEOUT_S=3.0
+READ_TIMEOUT_S=10.0
+POOL_CONNECTIONS=1   # One host: the RCS server
+POOL_MAXSIZE=8       # Keep-alive connections kept open to it
+LATENCY_WINDOW=500   # Requests kept for latency statistics
+BIND_CACHE_TTL_S=300.0  # A cached berth state older than this is probed again
+CALL_DEADLINE_S=5.0     # Wall-clock limit of a single request, connect and response included
+BREAKER_FAILURES=3      # Consecutive failures that open the circuit
+BREAKER_OPEN_S=15.0     # Time the circuit stays open before one trial request
+BREAKER_CLOSED="closed"
+BREAKER_OPEN="open"
+BREAKER_HALF_OPEN="half-open"
+
+
+class HikUnavailable(Exception):
+    """The RCS server could not be reached; the request may be retried later"""
+
+
+class BindStateCache:
+    """
+    (container code, bind) of each berth (positionCode/stgBin) as last seen
+    on the RCS server. Filled from the responses of our own requests, so
+    reading a berth's state does not need a probe bind/unbind round trip.
+    Entries expire after ttl_s; invalidate() drops them explicitly.
+    """
+    def __init__(self, ttl_s: float = BIND_CACHE_TTL_S):
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[str, str, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, positionCode: str, stgBin: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            entry = self._entries.get((positionCode, stgBin))
+            if entry is None or time.monotonic() - entry[2] > self.ttl_s:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, positionCode: str, stgBin: str, ctnrCod: str, bind: str):
+        with self._lock:
+            self._entries[(positionCode, stgBin)] = (ctnrCod, bind, time.monotonic())
+
+    def invalidate(self, positionCode: Optional[str] = None, stgBin: Optional[str] = None):
+        """Drop one berth, or every berth when called without arguments"""
+        with self._lock:
+            if positionCode is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((positionCode, stgBin), None)
+
+
+class CircuitBreaker:
+    """
+    Stops calling an RCS server that keeps failing.
+    closed: requests go through; failure_threshold consecutive failures
+    open the circuit. open: requests fail fast (allow() is False) for open_s.
+    half-open: after open_s the next request is let through as a trial;
+    success closes the circuit, failure opens it again. The state is only
+    half-open while that trial is actually in flight.
+    """
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, open_s: float = BREAKER_OPEN_S, name: str = ""):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_s = float(open_s)
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False  # the half-open trial request is in flight
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial request through (0: the next request is the trial)"""
+        with self._lock:
+            if self._state != BREAKER_OPEN:
+                return 0.0
+            return max(0.0, self.open_s - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.open_s:
+                self._set(BREAKER_HALF_OPEN)
+            if self._state == BREAKER_CLOSED:
+                return True
+            if self._state == BREAKER_HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+            if self._state != BREAKER_CLOSED:
+                self._set(BREAKER_CLOSED)
+
+    def release(self):
+        """The server answered but rejected the request itself (4xx): neither a success nor a failure"""
+        with self._lock:
+            if self._state == BREAKER_HALF_OPEN and self._trial:
+                # Undecided trial: stay open, the next request is tried again
+                self._trial = False
+                self._opened_at = time.monotonic() - self.open_s
+                self._set(BREAKER_OPEN)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._state == BREAKER_HALF_OPEN or (self._state == BREAKER_CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                self._set(BREAKER_OPEN)
+
+    def _set(self, state: str):
+        logger.warning(f"RCS server {self.name} circuit {self._state} -> {state} after {self._failures} failures")
+        self._state = state
+
+
+_bind_caches: Dict[Tuple[str, str], BindStateCache] = {}
+_bind_caches_lock = threading.Lock()
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+
+def bind_cache_for(ip_address, port, ttl_s: float = BIND_CACHE_TTL_S) -> BindStateCache:
+    """The cache shared by every client of one RCS server"""
+    with _bind_caches_lock:
+        cache = _bind_caches.get((str(ip_address), str(port)))
+        if cache is None:
+            cache = _bind_caches[(str(ip_address), str(port))] = BindStateCache(ttl_s)
+        return cache
+
+
+def breaker_for(ip_address, port, failure_threshold: int = BREAKER_FAILURES,
+                open_s: float = BREAKER_OPEN_S) -> CircuitBreaker:
+    """The circuit breaker shared by every client of one RCS server"""
+    with _bind_caches_lock:
+        breaker = _breakers.get((str(ip_address), str(port)))
+        if breaker is None:
+            breaker = _breakers[(str(ip_address), str(port))] = CircuitBreaker(failure_threshold, open_s,
+                                                                               f"{ip_address}:{port}")
+        return breaker
+
+
+def accepted(response) -> bool:
+    """Whether the RCS server carried out the request (HTTP 200 and code 0)"""
+    try:
+        return response is not None and response.status_code == 200 and response.json().get("code") == '0'
+    except ValueError:
+        return False
+
+
+def server_failing(status_code: int) -> bool:
+    """Whether an HTTP status means the server is overloaded or failing (5xx/429), not that it refused the request"""
+    return status_code >= 500 or status_code == 429
+
+
+def transient(error: BaseException) -> bool:
+    """Whether a request failed for a reason a later retry can fix: no answer, time-out, 5xx or 429"""
+    if isinstance(error, (HikUnavailable, requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and server_failing(error.response.status_code)
+    return False
+
+
 class RequestHIK:
     """"
     phai co: reqCode,ctnrCod,indBind,positionCode \r\n
@@ -58,19 +241,180 @@ class RequestHIK:
         return data
     
 class HIKSERVER:
-    def __init__(self, ip_address, port):
+    """
+    Client of the RCS server. All requests go through one pooled
+    requests.Session, so connections are kept alive and reused instead of
+    opening a TCP connection per call. Connect and read timeouts are
+    separate; the latency of every request is recorded (latency_stats()).
+    Berth states seen in responses are kept in a BindStateCache shared by
+    all clients of the same server (get_bind_state()). A shared
+    CircuitBreaker makes requests fail fast (return None, like any
+    unreachable-server error) while the server keeps failing; connection
+    errors, timeouts and 5xx/429 answers count as failures. Requests run
+    on a small executor so the caller waits at most call_deadline seconds
+    in total, however slowly the server trickles its answer.
+    """
+    def __init__(self, ip_address, port, connect_timeout: float = CONNECT_TIMEOUT_S,
+                 read_timeout: float = READ_TIMEOUT_S, pool_connections: int = POOL_CONNECTIONS,
+                 pool_maxsize: int = POOL_MAXSIZE, bind_cache_ttl: float = BIND_CACHE_TTL_S,
+                 call_deadline: float = CALL_DEADLINE_S, breaker_failures: int = BREAKER_FAILURES,
+                 breaker_open_s: float = BREAKER_OPEN_S):
         self.ip_address = ip_address
         self.port = port
-    
+        self.call_deadline = float(call_deadline)
+        # Socket timeouts only bound each connect/read; call_deadline bounds the whole call
+        self.timeout = (min(float(connect_timeout), self.call_deadline), min(float(read_timeout), self.call_deadline))
+        self._calls = ThreadPoolExecutor(max_workers=int(pool_maxsize), thread_name_prefix="HikCall")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=int(pool_connections), pool_maxsize=int(pool_maxsize), max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._latency_lock = threading.Lock()
+        self.requests_sent = 0
+        self.failures = 0
+        self.last_latency_ms: Optional[float] = None
+        self.bind_cache = bind_cache_for(ip_address, port, bind_cache_ttl)
+        self.breaker = breaker_for(ip_address, port, breaker_failures, breaker_open_s)
+
+    @classmethod
+    def from_config(cls, rtc: dict) -> "HIKSERVER":
+        """Build the client from the rtc section of config.yaml"""
+        return cls(ip_address=rtc['ip_address'], port=rtc['port'],
+                   connect_timeout=rtc.get('connect_timeout_s', CONNECT_TIMEOUT_S),
+                   read_timeout=rtc.get('read_timeout_s', READ_TIMEOUT_S),
+                   pool_connections=rtc.get('pool_connections', POOL_CONNECTIONS),
+                   pool_maxsize=rtc.get('pool_maxsize', POOL_MAXSIZE),
+                   bind_cache_ttl=rtc.get('bind_cache_ttl_s', BIND_CACHE_TTL_S),
+                   call_deadline=rtc.get('call_deadline_s', CALL_DEADLINE_S),
+                   breaker_failures=rtc.get('breaker_failures', BREAKER_FAILURES),
+                   breaker_open_s=rtc.get('breaker_open_s', BREAKER_OPEN_S))
+
     def bind_ctnr_and_bin(self, hikreq:RequestHIK):
         url = f'http://{self.ip_address}:{self.port}/rcms/services/rest/hikRpcService/bindCtnrAndBin'
+        if not self.breaker.allow():
+            # Fail fast: callers treat None as unreachable and the outbox retries later
+            logger.debug(f"Request {hikreq.reqCode} not sent, circuit to {self.ip_address}:{self.port} is open")
+            return None
+        started = time.perf_counter()
         try:
-            response = requests.post(url=url, json=hikreq.data, timeout=30)
-            response.raise_for_status()  # Raise exception if status code >= 400
-            return response
+            response = self._post(url, hikreq.data)
         except requests.exceptions.ConnectionError:
+            self._record(started, ok=False)
+            self.breaker.record_failure()
             logger.exception("Failed to connect to server.")
-        return None  
+            return None
+        except requests.exceptions.Timeout:
+            self._record(started, ok=False)
+            self.breaker.record_failure()
+            logger.error(f"Request {hikreq.reqCode} to {url} timed out after {time.perf_counter() - started:.1f}s")
+            return None
+        except requests.exceptions.RequestException:
+            self._record(started, ok=False)
+            self.breaker.record_failure()
+            raise
+        self._record(started, ok=response.status_code < 400)
+        if server_failing(response.status_code):
+            self.breaker.record_failure()  # Overloaded or failing server
+            response.raise_for_status()
+        try:
+            response.raise_for_status()  # Raise exception if status code >= 400
+        except requests.exceptions.HTTPError:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        self._remember(hikreq, response)
+        return response
+
+    def _post(self, url: str, data: dict):
+        """session.post with a wall-clock deadline; raises requests Timeout once call_deadline has passed"""
+        future = self._calls.submit(self.session.post, url=url, json=data, timeout=self.timeout)
+        try:
+            return future.result(timeout=self.call_deadline)
+        except FutureTimeout:
+            # The worker gives up on its own when the socket timeouts expire; the answer is ignored
+            future.cancel()
+            raise requests.exceptions.Timeout(f"No complete answer within {self.call_deadline:.1f}s")
+
+    def _remember(self, hikreq: RequestHIK, response):
+        """Update the bind cache from the server's answer to hikreq"""
+        try:
+            result = response.json()
+        except ValueError:
+            self.bind_cache.invalidate(hikreq.positionCode, hikreq.stgBinCode)
+            return
+        if result.get("code") == '0':
+            if hikreq.indBind == '1':
+                self.bind_cache.put(hikreq.positionCode, hikreq.stgBinCode, hikreq.ctnrCod, '1')
+            else:
+                self.bind_cache.put(hikreq.positionCode, hikreq.stgBinCode, '', '0')
+        elif 'has bind container code' in str(result.get('message', '')):
+            self.bind_cache.put(hikreq.positionCode, hikreq.stgBinCode, result['message'].split()[-1], '1')
+        else:
+            self.bind_cache.invalidate(hikreq.positionCode, hikreq.stgBinCode)
+
+    def get_bind_state(self, ctnrType, positionCode, stgBin, refresh: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        (container code, bind) of a berth: from the cache, or probed on the
+        server on a miss or with refresh. None when the server is unreachable.
+        """
+        if not refresh:
+            cached = self.bind_cache.get(positionCode, stgBin)
+            if cached is not None:
+                return cached
+        return self.probe_bind_state(ctnrType, positionCode, stgBin)
+
+    def probe_bind_state(self, ctnrType, positionCode, stgBin,
+                         ctnrCod=CONTAINER_CODE_OUTSIDE) -> Optional[Tuple[str, str]]:
+        """
+        Find a berth's container by binding ctnrCod to it: if that works the
+        berth was empty and ctnrCod is unbound again, otherwise the server
+        names the container already bound there.
+        """
+        hikreq = RequestHIK(random_string(8), ctnrType, ctnrCod, positionCode, '1', stgBinCode=stgBin)
+        try:
+            result = self.bind_ctnr_and_bin(hikreq=hikreq)
+        except Exception as e:
+            logger.warning(f"Request raised exception: {e}")
+            return None
+        if result is None:
+            return None
+        logger.info(result.json())
+        if result.json()["code"]=='0':
+            hikreq = RequestHIK(random_string(8), ctnrType, ctnrCod, positionCode, '0', stgBinCode=stgBin)
+            response = self.bind_ctnr_and_bin(hikreq=hikreq)
+            if response is None or response.status_code != 200:
+                logger.error(f"Unbinding probe container {ctnrCod} from {positionCode} failed")
+                self.bind_cache.invalidate(positionCode, stgBin)
+            return ('','0')
+        elif 'has bind container code' in result.json()['message']:
+            return (result.json()['message'].split()[-1],'1')
+        else:
+            return ('','')
+
+    def _record(self, started: float, ok: bool):
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        with self._latency_lock:
+            self.requests_sent += 1
+            self.failures += not ok
+            self.last_latency_ms = latency_ms
+            self._latencies.append(latency_ms)
+
+    def latency_stats(self) -> Dict[str, object]:
+        """Request count, failures and latency (ms) over the last LATENCY_WINDOW requests"""
+        with self._latency_lock:
+            latencies = np.asarray(self._latencies)
+            stats = {"requests": self.requests_sent, "failures": self.failures,
+                     "breaker": self.breaker.state, "rejected": self.breaker.rejected}
+        if len(latencies):
+            stats.update({
+                "last_ms": float(latencies[-1]),
+                "mean_ms": float(latencies.mean()),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "max_ms": float(latencies.max()),
+            })
+        return stats
     def random_string(self,length=6):
         letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
         return ''.join(random.choice(letters) for i in range(length))
@@ -0,0 +1,71 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from logger_config import get_logger
+logger = get_logger(__name__)
+ROI_MODES=("full","union","clusters")
+Rect=Tuple[int, int, int, int]  # x1, y1, x2, y2 in pixels, x2/y2 exclusive
+
+
+def zone_rects(zones: dict, width: int, height: int, margin: float = 0.05) -> List[Rect]:
+    """Bounding rectangle of every zone polygon, grown by margin (fraction of the frame size)"""
+    rects = []
+    mx, my = margin * width, margin * height
+    for data in zones.values():
+        pts = np.asarray(data['points'], dtype=np.float64)
+        if pts.size == 0:
+            continue
+        x1 = int(max(0, pts[:, 0].min() * width - mx))
+        y1 = int(max(0, pts[:, 1].min() * height - my))
+        x2 = int(min(width, np.ceil(pts[:, 0].max() * width + mx)))
+        y2 = int(min(height, np.ceil(pts[:, 1].max() * height + my)))
+        if x2 > x1 and y2 > y1:
+            rects.append((x1, y1, x2, y2))
+    return rects
+
+
+def union_rect(rects: List[Rect]) -> Optional[Rect]:
+    if not rects:
+        return None
+    arr = np.asarray(rects)
+    return (int(arr[:, 0].min()), int(arr[:, 1].min()), int(arr[:, 2].max()), int(arr[:, 3].max()))
+
+
+def cluster_rects(rects: List[Rect]) -> List[Rect]:
+    """Merge overlapping rectangles until none overlap; returns one rectangle per cluster"""
+    clusters = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(clusters)):
+            for j in range(i + 1, len(clusters)):
+                a, b = clusters[i], clusters[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    clusters[i] = union_rect([a, b])
+                    del clusters[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return clusters
+
+
+def crop_regions(zones: dict, width: int, height: int, mode: str = "union", margin: float = 0.05) -> List[Rect]:
+    """Regions of the frame to run the model on; the full frame when mode is 'full' or there are no zones"""
+    rects = zone_rects(zones, width, height, margin) if mode != "full" else []
+    if not rects:
+        return [(0, 0, width, height)]
+    if mode == "clusters":
+        return cluster_rects(rects)
+    return [union_rect(rects)]
+
+
+def merge_crop_detections(boxes: List[np.ndarray], rects: List[Rect]) -> np.ndarray:
+    """Shift per-crop (N, 6) x1,y1,x2,y2,score,class arrays back to full-frame coordinates and stack them"""
+    shifted = []
+    for data, (x1, y1, _, _) in zip(boxes, rects):
+        if len(data):
+            data = data.copy()
+            data[:, [0, 2]] += x1
+            data[:, [1, 3]] += y1
+            shifted.append(data)
+    return np.concatenate(shifted) if shifted else np.zeros((0, 6), np.float32)
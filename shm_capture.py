@@ -0,0 +1,260 @@
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+import numpy as np
+from frame_grabber import FrameGrabber, backoff_delay, STATUS_RECONNECTING, STATUS_STOPPED
+from logger_config import get_logger
+logger = get_logger(__name__)
+DEFAULT_RING_SLOTS=8
+# header (int64): latest seq, decoded, dropped, skipped, reconnects, then one seq per slot
+_LATEST, _DECODED, _DROPPED, _SKIPPED, _RECONNECTS = range(5)
+_HEADER_FIELDS=5
+
+
+class FrameRing:
+    """
+    Fixed-size ring of frames in a multiprocessing.shared_memory block.
+    One writer process fills the slots in turn; readers get zero-copy numpy
+    views of the newest complete slot. A view stays valid until the writer
+    wraps around to its slot, i.e. for slots-1 newer frames; keep a copy
+    for anything that must live longer.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, ...], dtype: np.dtype, slots: int):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        header_bytes = self._header_bytes(slots)
+        self.header = np.ndarray((_HEADER_FIELDS + slots,), np.int64, buffer=shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, self.dtype, buffer=shm.buf, offset=header_bytes)
+
+    @staticmethod
+    def _header_bytes(slots: int) -> int:
+        return -(-8 * (_HEADER_FIELDS + slots) // 64) * 64
+
+    @classmethod
+    def create(cls, shape: Tuple[int, ...], dtype: np.dtype, slots: int = DEFAULT_RING_SLOTS) -> "FrameRing":
+        size = cls._header_bytes(slots) + slots * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        ring = cls(shared_memory.SharedMemory(create=True, size=size), shape, dtype, slots)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, shape: Tuple[int, ...], dtype: np.dtype, slots: int) -> "FrameRing":
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            # The writer owns the block; keep this process' resource tracker from unlinking it
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, shape, dtype, slots)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, frame: np.ndarray):
+        seq = int(self.header[_LATEST]) + 1
+        i = seq % self.slots
+        self.header[_HEADER_FIELDS + i] = -1       # slot is being written
+        self.frames[i][...] = frame
+        self.header[_HEADER_FIELDS + i] = seq
+        self.header[_LATEST] = seq
+
+    def latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Return (seq, view) of the newest complete frame, (0, None) if there is none"""
+        seq = int(self.header[_LATEST])
+        if seq <= 0:
+            return 0, None
+        i = seq % self.slots
+        if int(self.header[_HEADER_FIELDS + i]) != seq:
+            return 0, None
+        return seq, self.frames[i]
+
+    def close(self, unlink: bool = False):
+        self.header = None
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A consumer still holds a view; the mapping goes away with it
+            pass
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _capture_worker(url: str, target_fps: Optional[float], capture_options: Optional[str], slots: int,
+                    events: multiprocessing.Queue, stop_event):
+    """Worker process: decode url with a FrameGrabber and publish frames into a FrameRing"""
+    grabber = FrameGrabber(url, target_fps=target_fps, capture_options=capture_options,
+                           on_status=lambda status: events.put(("status", status)))
+    grabber.start()
+    ring = None
+    try:
+        while not stop_event.is_set():
+            ret, frame = grabber.read(timeout=0.5)
+            if not ret:
+                if grabber.closed:
+                    break
+                continue
+            if ring is None or ring.shape != frame.shape or ring.dtype != frame.dtype:
+                old, ring = ring, FrameRing.create(frame.shape, frame.dtype, slots)
+                events.put(("ring", ring.name, frame.shape, frame.dtype.str, slots))
+                if old is not None:
+                    old.close(unlink=True)
+            ring.write(frame)
+            ring.header[_DECODED] = grabber.decoded
+            ring.header[_DROPPED] = grabber.dropped
+            ring.header[_SKIPPED] = grabber.skipped
+            ring.header[_RECONNECTS] = grabber.reconnects
+    finally:
+        grabber.stop()
+        if ring is not None:
+            ring.close(unlink=True)
+
+
+class ShmFrameReader:
+    """
+    Drop-in replacement for FrameGrabber that runs capture and decode in a
+    separate process, so decoding no longer competes with the GUI and
+    inference for the GIL. read() returns zero-copy views into the worker's
+    FrameRing. A worker process that dies is restarted with backoff.
+    """
+    def __init__(self, url: str, target_fps: Optional[float] = None, capture_options: Optional[str] = None,
+                 on_status: Optional[Callable[[str], None]] = None, slots: int = DEFAULT_RING_SLOTS):
+        self.url = url
+        self.target_fps = target_fps
+        self.capture_options = capture_options
+        self.slots = max(2, int(slots))
+        self.on_status = on_status
+        self.status = ""
+        self.closed = False
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = None
+        self._stop_event = None
+        self._process = None
+        self._ring: Optional[FrameRing] = None
+        self._taken = 0
+        self._dropped = 0
+        self._stopping = threading.Event()
+        self._pump = threading.Thread(target=self._pump_events, name=f"ShmFrameReader-{url}", daemon=True)
+
+    def start(self):
+        self._spawn()
+        self._pump.start()
+
+    def is_alive(self) -> bool:
+        return self._pump.is_alive()
+
+    def _spawn(self):
+        self._events = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._process = self._ctx.Process(
+            target=_capture_worker,
+            args=(self.url, self.target_fps, self.capture_options, self.slots, self._events, self._stop_event),
+            name=f"capture-{self.url}",
+            daemon=True,
+        )
+        self._process.start()
+        logger.info(f"Started capture process {self._process.pid} for {self.url}")
+
+    def _pump_events(self):
+        attempt = 0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    event = self._events.get(timeout=0.5)
+                except queue.Empty:
+                    if not self._process.is_alive() and not self._stopping.is_set():
+                        attempt += 1
+                        delay = backoff_delay(attempt)
+                        logger.warning(f"Capture process for {self.url} exited "
+                                       f"(code {self._process.exitcode}), restarting in {delay:.1f}s")
+                        self._set_status(f"{STATUS_RECONNECTING} in {delay:.0f}s (attempt {attempt})")
+                        if self._stopping.wait(delay):
+                            break
+                        self._spawn()
+                    continue
+                if event[0] == "status":
+                    self._set_status(event[1])
+                elif event[0] == "ring":
+                    _, name, shape, dtype, slots = event
+                    try:
+                        ring = FrameRing.attach(name, shape, np.dtype(dtype), slots)
+                    except FileNotFoundError:
+                        continue  # already replaced by a newer ring
+                    old, self._ring, self._taken = self._ring, ring, 0
+                    attempt = 0
+                    if old is not None:
+                        old.close()
+        finally:
+            self.closed = True
+            self._set_status(STATUS_STOPPED)
+
+    def _set_status(self, status: str):
+        if status == self.status:
+            return
+        self.status = status
+        if self.on_status is not None:
+            try:
+                self.on_status(status)
+            except Exception as e:
+                logger.exception(f"Status callback failed for {self.url}: {e}")
+
+    def read(self, timeout: Optional[float] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Wait for a frame newer than the last one taken and return a view of it"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ring = self._ring
+            if ring is not None and ring.header is not None:
+                seq, frame = ring.latest()
+                if seq > self._taken:
+                    if self._taken:
+                        self._dropped += seq - self._taken - 1
+                    self._taken = seq
+                    return True, frame
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                return False, None
+            time.sleep(0.002)
+
+    def _counter(self, field: int) -> int:
+        ring = self._ring
+        return int(ring.header[field]) if ring is not None and ring.header is not None else 0
+
+    @property
+    def decoded(self) -> int:
+        return self._counter(_DECODED)
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped + self._counter(_DROPPED)
+
+    @property
+    def skipped(self) -> int:
+        return self._counter(_SKIPPED)
+
+    @property
+    def reconnects(self) -> int:
+        return self._counter(_RECONNECTS)
+
+    def stop(self, timeout: Optional[float] = 2.0):
+        """Stop the worker process and detach from its ring"""
+        self._stopping.set()
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._process is not None and self._process.is_alive():
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        if self._pump.is_alive() and threading.current_thread() is not self._pump:
+            self._pump.join(timeout)
+        ring, self._ring = self._ring, None
+        if ring is not None:
+            ring.close()
@@ -0,0 +1,93 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+import requests
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtCore = pytest.importorskip("PyQt6.QtCore")
+from hik_dispatcher import HikJob
+from hik_outbox import HikOutbox
+from requestHIK_bin import HikUnavailable
+
+
+class FakeDispatcher:
+    """Keeps submitted jobs so the test decides when and how they finish"""
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, berth, fn, *args, name="", callback=None):
+        job = HikJob(berth, name, fn, args, callback)
+        self.jobs.append(job)
+        return job
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    dispatcher = FakeDispatcher()
+    box = HikOutbox(dispatcher, path=tmp_path / "outbox.sqlite3")
+    box.register_handler("zone_state", lambda payload: payload["new_state"])
+    yield box, dispatcher
+    box.close()
+
+
+def finish(job, error=None):
+    if error is None:
+        job.result = job.fn(*job.args)
+    job.error = error
+    job.callback(job)
+
+
+def test_failed_in_flight_event_does_not_cancel_newer_one(outbox):
+    box, dispatcher = outbox
+    box.append("P1/S1", "zone_state", {"new_state": 1}, state=1, baseline=0)        # A, sent at once
+    assert len(dispatcher.jobs) == 1
+    box.append("P1/S1", "zone_state", {"new_state": 0}, state=0, baseline=1)        # B
+    box.append("P1/S1", "zone_state", {"new_state": 1}, state=1, baseline=0)        # C supersedes B
+    finish(dispatcher.jobs[0], HikUnavailable("server down"))                         # A never reached the server
+    box._retry_at = 0.0
+    box.pump()
+    assert box.cancelled == 0
+    assert len(dispatcher.jobs) == 2
+    finish(dispatcher.jobs[1])
+    assert box.delivered_count == 1
+    assert box.backlog() == 0
+
+
+def test_flip_and_back_after_delivery_is_cancelled(outbox):
+    box, dispatcher = outbox
+    box.append("P1/S1", "zone_state", {"new_state": 1}, state=1, baseline=0)
+    finish(dispatcher.jobs[0])
+    box.append("P1/S1", "zone_state", {"new_state": 0}, state=0, baseline=1, window_s=60)
+    box.append("P1/S1", "zone_state", {"new_state": 1}, state=1, baseline=0, window_s=60)
+    for event in box._pending.values():
+        event.due = 0.0
+    box.pump()
+    assert box.cancelled == 1
+    assert len(dispatcher.jobs) == 1
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+
+def test_rejected_event_is_failed_not_retried(outbox):
+    box, dispatcher = outbox
+    box.append("P1/S1", "zone_state", {"new_state": 1}, state=1, baseline=0)
+    finish(dispatcher.jobs[0], http_error(400))
+    assert box.retries == 0
+    assert box.backlog() == 0
+    assert box._retry_at == 0.0
+    box.append("P2/S1", "zone_state", {"new_state": 1}, state=1, baseline=0)       # Other berths go out at once
+    assert len(dispatcher.jobs) == 2
+
+
+def test_overloaded_server_is_retried(outbox):
+    box, dispatcher = outbox
+    box.append("P1/S1", "zone_state", {"new_state": 1}, state=1, baseline=0)
+    finish(dispatcher.jobs[0], http_error(503))
+    assert box.retries == 1
+    assert box.backlog() == 1
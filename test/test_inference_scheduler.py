@@ -0,0 +1,49 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import numpy as np
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from inference_scheduler import InferenceScheduler
+
+
+class FakeModel:
+    """Model handle returning one result per frame and counting calls"""
+    key = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, frames, **kwargs):
+        self.calls += 1
+        return [frame.shape for frame in frames]
+
+
+def test_skipping_camera_does_not_hold_the_batch():
+    scheduler = InferenceScheduler(deadline_ms=2000, max_batch=4)
+    model = FakeModel()
+    active, gated = object(), object()
+    scheduler.register(active)
+    scheduler.register(gated)
+    scheduler.skip(gated)
+    started = time.monotonic()
+    result = scheduler.infer(active, model, np.zeros((4, 4, 3), np.uint8), timeout=5)
+    assert result == (4, 4, 3)
+    assert time.monotonic() - started < 1.0
+
+
+def test_batch_waits_for_every_submitting_camera():
+    scheduler = InferenceScheduler(deadline_ms=2000, max_batch=4)
+    model = FakeModel()
+    cameras = [object(), object()]
+    for camera in cameras:
+        scheduler.register(camera)
+    threads = [threading.Thread(target=scheduler.infer, args=(camera, model, np.zeros((2, 2, 3), np.uint8), 5))
+               for camera in cameras]
+    threads[0].start()
+    time.sleep(0.2)
+    assert model.calls == 0
+    threads[1].start()
+    for thread in threads:
+        thread.join(5)
+    assert model.calls == 1
@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+pytest.importorskip("requests")
+import requests
+from requestHIK_bin import BREAKER_CLOSED, BREAKER_OPEN, HIKSERVER, RequestHIK
+
+
+class Handler(BaseHTTPRequestHandler):
+    mode = "ok"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.mode == "503":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b'{"code": "0", "message": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.mode == "trickle":
+            for byte in body:  # one byte per second: every read is within the read timeout
+                self.wfile.write(bytes([byte]))
+                self.wfile.flush()
+                time.sleep(1.0)
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+
+
+def client(httpd, **kwargs):
+    return HIKSERVER("127.0.0.1", httpd.server_address[1], **kwargs)
+
+
+def request():
+    return RequestHIK("R1", "1", "99", "P1", "1", stgBinCode="S1")
+
+
+def test_call_deadline_is_wall_clock(server):
+    Handler.mode = "trickle"
+    hik = client(server, read_timeout=10, call_deadline=2, breaker_failures=10)
+    started = time.monotonic()
+    assert hik.bind_ctnr_and_bin(request()) is None
+    assert time.monotonic() - started < 3.0
+
+
+def test_server_errors_open_the_breaker(server):
+    Handler.mode = "503"
+    hik = client(server, breaker_failures=3, breaker_open_s=0.2)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.HTTPError):
+            hik.bind_ctnr_and_bin(request())
+    assert hik.breaker.state == BREAKER_OPEN
+    assert hik.bind_ctnr_and_bin(request()) is None  # fails fast
+    time.sleep(0.3)
+    assert hik.breaker.state == BREAKER_OPEN  # no trial in flight yet
+    Handler.mode = "ok"
+    assert hik.bind_ctnr_and_bin(request()) is not None
+    assert hik.breaker.state == BREAKER_CLOSED
@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from zone_state_engine import ZoneStateEngine, EVENT_CHANGED, EVENT_EMPTY
+
+
+def replay(engine, slots, samples):
+    """Feed (now, observed, sampled) tuples and return the (kind, now) of every event"""
+    events = []
+    for now, observed, sampled in samples:
+        events += [(event.kind, now) for event in engine.update(slots, [observed], now, sampled=sampled)]
+    return events
+
+
+def test_occupied_zone_sampled_slowly_is_not_reported_empty():
+    engine = ZoneStateEngine(empty_s=5.0)
+    slots = engine.register("cam", ["A"], [(7, 10)])
+    # Keyframe-only decode: one sample every 2 s, all occupied
+    events = replay(engine, slots, [(2.0 * i, 1, True) for i in range(10)])
+    assert events == [(EVENT_CHANGED, 12.0)]
+
+
+def test_gated_zone_is_not_reported_empty():
+    engine = ZoneStateEngine(empty_s=5.0)
+    slots = engine.register("cam", ["A"], [(7, 10)])
+    # Sampled once, then the motion gate reuses that result without new votes
+    events = replay(engine, slots, [(0.0, 1, True)] + [(0.5 * i, 1, False) for i in range(1, 30)])
+    assert events == []
+
+
+def test_zone_voted_empty_is_reported_once_after_empty_s():
+    engine = ZoneStateEngine(empty_s=5.0)
+    slots = engine.register("cam", ["A"], [(7, 10)])
+    events = replay(engine, slots, [(1.0 * i, 0, True) for i in range(20)])
+    # Voted empty at the 7th sample (t=6), reported empty_s later
+    assert events == [(EVENT_EMPTY, 11.0)]
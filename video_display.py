@@ -13,10 +13,11 @@ import logging
 import sys
 import yaml
 from typing import Dict, List, Tuple, Optional, Union
-from requestHIK_bin import HIKSERVER,RequestHIK
+from requestHIK_bin import HIKSERVER
+from hik_dispatcher import shared_dispatcher, berth_key, DISPATCH_WORKERS
+import polygon_store
 from logger_config import get_logger
-from utils import random_string, resource_path,ensure_user_file,user_config_path
-import utils
+from utils import resource_path,ensure_user_file,user_config_path
 # Configure logging
 logger = get_logger(__name__)
 
@@ -287,7 +288,13 @@ class VideoDisplay(QWidget):
         self.hik_error.connect(self.on_hik_error)
         
         # Initialize HIK server
-        self.hikserver = HIKSERVER(ip_address=self.ip_address, port=self.port)
+        self.hikserver = HIKSERVER.from_config({**config["rtc"], "ip_address": self.ip_address, "port": self.port})
+        # Same dispatcher as the live bind/unbind traffic, so probes never interleave with a berth's binds
+        self.hik_dispatcher = shared_dispatcher(max_workers=config["rtc"].get("dispatch_workers", DISPATCH_WORKERS))
+        self.reconcile_total=0
+        self.reconcile_done=0
+        self.reconcile_failed=0
+        self.reconcile_started=0.0
         self.connect = True
         self.dev_mode=dict()
         # Initialize UI and load saved data
@@ -573,48 +580,56 @@ class VideoDisplay(QWidget):
             self.update_status(status_text)
     # Initialize current container code and bind status at start-up
     def init_shape_info(self):
+        """
+        Read the container code and bind of every configured shape from the
+        server through the shared HIK dispatcher; results are filled in as they arrive
+        (on_shape_reconciled), so the window and the streams do not wait.
+        """
+        jobs=[]
         for url in self.polygons.keys():
             for shape in self.polygons[url].keys():
                 if self.polygons[url][shape]["status"]==ShapeStatus.SUCCESSFUL.name:
                     shape_info=self.polygons[url][shape]
-                    print(f"url {url} with {shape_info['stgBin']}")
-                    shape_ctnr_code_bind=self.get_info_shape_ctnrcode_bind(shape_info["ctnrType"],
-                                                      shape_info["positionCode"],
-                                                      shape_info["stgBin"])
-                    logger.info(f"Get shape {shape_ctnr_code_bind}")
-                    if shape_ctnr_code_bind is not None and shape_ctnr_code_bind[1]!='':
-                        self.polygons[url][shape]["ctnrCod"]=shape_ctnr_code_bind[0]
-                        self.polygons[url][shape]["bind"]=shape_ctnr_code_bind[1]
-        self.save_polygons()
-    #Automatically get container code and bind status
-    def get_info_shape_ctnrcode_bind(self,ctnrType,positionCode,stgBin,ctnrCod=utils.CONTAINER_CODE_OUTSIDE):
-        hikreq = RequestHIK(random_string(8),ctnrType, ctnrCod, \
-                                positionCode, '1',stgBinCode=stgBin)
-        try:
-            result = self.hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-            if result is not None:
-                    if result.status_code == 200:
-                        logger.info(f"Request successful")
-                    else:
-                        logger.error(f"Request failed")
-        except Exception as e:
-            logger.warning(f"Request raised exception: {e}")
-            return None
-        print(result.json())
-        if result.json()["code"]=='0':
-            hikreq = RequestHIK(random_string(8),ctnrType, ctnrCod, \
-                                positionCode, '0',stgBinCode=stgBin)
-            response = self.hikserver.bind_ctnr_and_bin(hikreq=hikreq)
-            if response is not None:
-                    if response.status_code == 200:
-                        logger.info(f"Request successful")
-                    else:
-                        logger.error(f"Request failed")
-            return ('','0')
-        elif 'has bind container code' in result.json()['message']:
-            return (result.json()['message'][-1:],'1')
+                    jobs.append((url, shape, shape_info["ctnrType"], shape_info["positionCode"], shape_info["stgBin"]))
+        self.reconcile_total=len(jobs)
+        self.reconcile_done=0
+        self.reconcile_failed=0
+        self.reconcile_started=time.monotonic()
+        if not jobs:
+            return
+        self.update_status(f"Reading bind state: 0/{len(jobs)} zones")
+        for url, shape, ctnrType, positionCode, stgBin in jobs:
+            self.hik_dispatcher.submit(berth_key(positionCode, stgBin), self.reconcile_shape,
+                                       url, shape, ctnrType, positionCode, stgBin,
+                                       name=f"reconcile {shape}", callback=self.on_shape_reconciled)
+    def reconcile_shape(self, url, shape, ctnrType, positionCode, stgBin):
+        """Dispatcher worker: returns (url, shape, (ctnrCod, bind) or None)"""
+        logger.info(f"url {url} with {stgBin}")
+        return url, shape, self.hikserver.get_bind_state(ctnrType, positionCode, stgBin, refresh=True)
+    def on_shape_reconciled(self, job):
+        """GUI thread: store one shape's server state and report progress"""
+        self.reconcile_done+=1
+        if job.error is not None or job.result[2] is None:
+            self.reconcile_failed+=1
         else:
-            return ('','')
+            url, shape, shape_ctnr_code_bind = job.result
+            logger.info(f"Get shape {shape_ctnr_code_bind}")
+            if shape_ctnr_code_bind[1]!='' and url in self.polygons and shape in self.polygons[url]:
+                fields={"ctnrCod": shape_ctnr_code_bind[0], "bind": shape_ctnr_code_bind[1]}
+                self.polygons[url][shape].update(fields)
+                try:
+                    # Only this shape's fields: binds saved meanwhile by the multi-camera view are kept
+                    polygon_store.update_shapes({(url, shape): fields})
+                except Exception as e:
+                    logger.exception(f"Error saving bind state of {shape}: {e}")
+        if self.reconcile_done < self.reconcile_total:
+            self.update_status(f"Reading bind state: {self.reconcile_done}/{self.reconcile_total} zones")
+            return
+        message=f"Bind state of {self.reconcile_total} zones read in {time.monotonic()-self.reconcile_started:.1f}s"
+        if self.reconcile_failed:
+            message+=f", {self.reconcile_failed} unreachable"
+        logger.info(message)
+        self.update_status(message)
     def edit_shape_properties(self, shape_name: str):
         """Edit properties of a shape"""
         try: 
@@ -678,7 +693,7 @@ class VideoDisplay(QWidget):
             # logger.info(result)
             is_successful=False
             if values['ctnrType'] and values['positionCode'] and values['stgBin']:
-                info=self.get_info_shape_ctnrcode_bind(values['ctnrType'],values['positionCode'],values['stgBin'])
+                info=self.hikserver.get_bind_state(values['ctnrType'],values['positionCode'],values['stgBin'],refresh=True)
                 if info is not None and info[1] != '':
                     values['ctnrCod']=info[0]
                     values['bind']=info[1]
@@ -709,7 +724,7 @@ class VideoDisplay(QWidget):
                 'status': status,
                 'bind':values['bind']
             }
-            self.save_polygons()
+            self.save_polygons(fresh={(self.current_url, new_name)})
             logger.info(f"Shape updated: {shape_name} -> {new_name}")
     def _connect_spinners(self):
         self.connecting.connect(self._on_connecting_spinner)
@@ -1069,16 +1084,13 @@ class VideoDisplay(QWidget):
         else:
             super().keyPressEvent(event)
     
-    def save_polygons(self):
-        """Save polygons to JSON file"""
+    def save_polygons(self, fresh=()):
+        """
+        Save polygons to JSON file. ctnrCod/bind saved meanwhile by the
+        multi-camera view are kept, except for the (url, shape) pairs in fresh.
+        """
         try:
-            path=user_config_path('camera_polygons.json')
-            tmp=path.with_suffix(".json.tmp")
-            with tmp.open('w',encoding="utf-8") as f:
-                json.dump(self.polygons, f, ensure_ascii=False,indent=2)
-            tmp.replace(path)
-            # with open(resource_path('camera_polygons.json'), 'w') as f:
-            #     json.dump(self.polygons, f, indent=2)
+            polygon_store.save_polygons(self.polygons, fresh)
             logger.info("Polygons saved successfully")
         except Exception as e:
             logger.exception(f"Error saving polygons: {e}")
@@ -0,0 +1,115 @@
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+from logger_config import get_logger
+logger = get_logger(__name__)
+MAX_INDEX_WIDTH=640  # Zones are rasterized at most this wide; boxes are scaled to match
+
+
+def zone_signature(zones: dict) -> Tuple:
+    """Hashable description of the zone geometry and thresholds; changes only when a zone is added, removed or edited"""
+    return tuple((name, tuple(map(tuple, data['points'])), data.get('coverage_thresh'))
+                 for name, data in zones.items())
+
+
+def zone_refs(zones: dict) -> Tuple:
+    """The zones' point lists and thresholds by identity: a cheap check, run every detection, that nothing was replaced"""
+    return tuple((name, id(data['points']), data.get('coverage_thresh')) for name, data in zones.items())
+
+
+class ZoneIndex:
+    """
+    Zones of one camera compiled for one frame size.
+    Every zone gets a bit in a label raster, so overlapping zones are fine
+    and all box centers are assigned in one fancy-indexing step instead of
+    one pointPolygonTest per box and zone. Each zone also keeps the integral
+    image of its mask, so the area of any box inside it costs four lookups.
+    Rebuild it (see ZoneIndex.for_zones) only when the zones or the frame
+    size change.
+    """
+    def __init__(self, zones: dict, width: int, height: int):
+        self.names: List[str] = list(zones)
+        self.width = int(width)
+        self.height = int(height)
+        self.signature = zone_signature(zones)
+        self.refs = zone_refs(zones)
+        self._points = [data['points'] for data in zones.values()]  # Keeps the ids in refs from being reused
+        self.scale = min(1.0, MAX_INDEX_WIDTH / max(1, self.width))
+        self.index_w = max(1, round(self.width * self.scale))
+        self.index_h = max(1, round(self.height * self.scale))
+        n = len(self.names)
+        dtype = np.uint8 if n <= 8 else np.uint16 if n <= 16 else np.uint32 if n <= 32 else np.uint64
+        bits = np.dtype(dtype).itemsize * 8
+        self._word = np.arange(n) // bits
+        self._shift = (np.arange(n) % bits).astype(dtype)
+        self.raster = np.zeros((max(1, -(-n // bits)), self.index_h, self.index_w), dtype)
+        self.integrals = np.zeros((n, self.index_h + 1, self.index_w + 1), np.int32)
+        # Zones without coverage_thresh keep the box-center test (NaN)
+        self.coverage_thresh = np.array([float(data.get('coverage_thresh', np.nan)) for data in zones.values()])
+        for i, data in enumerate(zones.values()):
+            mask = np.zeros((self.index_h, self.index_w), np.uint8)
+            pts = np.asarray(data['points'], np.float64).reshape(-1, 2)
+            if len(pts):
+                cv2.fillPoly(mask, [np.round(pts * (self.index_w, self.index_h)).astype(np.int32)], 1)
+            self.raster[self._word[i]][mask.astype(bool)] |= dtype(1) << self._shift[i]
+            self.integrals[i] = cv2.integral(mask)
+        self.areas = np.maximum(self.integrals[:, -1, -1], 1)
+
+    @classmethod
+    def for_zones(cls, current: Optional["ZoneIndex"], zones: dict, width: int, height: int) -> "ZoneIndex":
+        """
+        Return current if it still matches zones and the frame size, otherwise
+        a freshly built index. Zone points are expected to be replaced, not
+        edited in place; only then is the full signature compared.
+        """
+        if current is not None and current.width == width and current.height == height:
+            refs = zone_refs(zones)
+            if refs == current.refs:
+                return current
+            if current.signature == zone_signature(zones):
+                current.refs = refs
+                current._points = [data['points'] for data in zones.values()]
+                return current
+        index = cls(zones, width, height)
+        logger.info(f"Built zone index for {len(index.names)} zones at {width}x{height} "
+                    f"({index.index_w}x{index.index_h} raster)")
+        return index
+
+    def assign(self, boxes: np.ndarray) -> np.ndarray:
+        """(Z, N) bool matrix: whether the center of each x1,y1,x2,y2 box lies in each zone"""
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        if not len(self.names) or not len(boxes):
+            return np.zeros((len(self.names), len(boxes)), bool)
+        cx = np.clip(((boxes[:, 0] + boxes[:, 2]) * 0.5 * self.scale).astype(np.intp), 0, self.index_w - 1)
+        cy = np.clip(((boxes[:, 1] + boxes[:, 3]) * 0.5 * self.scale).astype(np.intp), 0, self.index_h - 1)
+        labels = self.raster[:, cy, cx]                      # (words, N)
+        return ((labels[self._word] >> self._shift[:, None]) & 1).astype(bool)
+
+    def coverage(self, boxes: np.ndarray) -> np.ndarray:
+        """(Z, N) share of each zone's area covered by each x1,y1,x2,y2 box (intersection over zone)"""
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        if not len(self.names) or not len(boxes):
+            return np.zeros((len(self.names), len(boxes)))
+        scaled = np.rint(boxes * self.scale).astype(np.intp)
+        x1, x2 = (np.clip(scaled[:, i], 0, self.index_w) for i in (0, 2))
+        y1, y2 = (np.clip(scaled[:, i], 0, self.index_h) for i in (1, 3))
+        ii = self.integrals
+        inside = ii[:, y2, x2] - ii[:, y1, x2] - ii[:, y2, x1] + ii[:, y1, x1]
+        return inside / self.areas[:, None]
+
+    def zone_coverage(self, boxes: np.ndarray) -> np.ndarray:
+        """(Z,) coverage of each zone by its best-covering box (0 without boxes)"""
+        cov = self.coverage(boxes)
+        return cov.max(axis=1) if cov.shape[1] else np.zeros(len(self.names))
+
+    def occupied(self, boxes: np.ndarray, coverage: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        (Z,) bool: zones with a coverage_thresh are occupied once a box covers
+        at least that share of them; the others once a box center lies inside.
+        """
+        occupied = self.assign(boxes).any(axis=1)
+        has_thresh = ~np.isnan(self.coverage_thresh)
+        if has_thresh.any():
+            coverage = self.zone_coverage(boxes) if coverage is None else coverage
+            occupied[has_thresh] = coverage[has_thresh] >= self.coverage_thresh[has_thresh]
+        return occupied
@@ -0,0 +1,179 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from logger_config import get_logger
+logger = get_logger(__name__)
+EMPTY_S=5.0        # A zone empty this long on start-up is reported once as empty
+DEFAULT_VOTE_N=7   # A zone flips once N of its last M detections agree
+DEFAULT_VOTE_M=10
+MAX_VOTE_M=63      # History is bit-packed in one uint64 per zone
+EVENT_CHANGED="changed"
+EVENT_EMPTY="empty"
+_POPCOUNT8=np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits of every element of a uint64 array (byte lookup table)"""
+    values = np.ascontiguousarray(values, np.uint64)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+def vote_settings(data: dict) -> Tuple[int, int]:
+    """(vote_n, vote_m) of a zone entry of camera_polygons.json, clamped to 1 <= n <= m <= MAX_VOTE_M"""
+    m = min(MAX_VOTE_M, max(1, int(data.get('vote_m', DEFAULT_VOTE_M))))
+    n = min(m, max(1, int(data.get('vote_n', DEFAULT_VOTE_N if m == DEFAULT_VOTE_M else m // 2 + 1))))
+    return n, m
+
+
+class ZoneEvent(NamedTuple):
+    kind: str          # EVENT_CHANGED or EVENT_EMPTY
+    camera: str
+    zone: str
+    old_state: int
+    new_state: int
+    timestamp: float
+    coverage: float = 0.0  # Share of the zone covered by its best box on the last detection
+
+
+class ZoneStateEngine:
+    """
+    Debounced occupancy of every zone of every camera, kept in flat arrays.
+    Each camera registers its zones once and gets their slots; update() takes
+    the raw occupancy of those slots for one detection batch and advances
+    all of them in one vectorized step:
+    - the last vote_m detections of each zone are kept as bits of a uint64;
+      the zone becomes occupied once vote_n of them saw it occupied and
+      empty once vote_n of them saw it empty, otherwise it keeps its state
+      (one noisy frame neither sets nor clears a zone);
+    - while its empty report is pending, a zone voted empty (vote_n of its
+      samples saw it empty) for empty_s is reported once as EVENT_EMPTY
+      (start-up clean-up of stale binds). A zone that is still 0 only
+      because too few samples were taken is not reported.
+    Only transitions come out as events. Time only enters through the now
+    argument, so feeding the same observations and timestamps replays the
+    same events.
+    """
+    def __init__(self, empty_s: float = EMPTY_S, capacity: int = 64):
+        self.empty_s = float(empty_s)
+        self._lock = threading.Lock()
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Optional[Tuple[str, str]]] = []
+        self._free: List[int] = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        """Grow the per-slot arrays to capacity, keeping existing slots"""
+        old = len(self._keys)
+        for name, dtype, fill in (("state", np.int8, 0), ("history", np.uint64, 0), ("samples", np.int64, 0),
+                                  ("vote_n", np.int64, DEFAULT_VOTE_N), ("vote_m", np.int64, DEFAULT_VOTE_M),
+                                  ("empty_since", np.float64, np.nan), ("empty_pending", bool, False),
+                                  ("changes", np.int32, 0), ("coverage", np.float32, 0.0)):
+            arr = np.full(capacity, fill, dtype)
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+        self._keys.extend([None] * (capacity - old))
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def register(self, camera: str, zones: Sequence[str], votes: Optional[Sequence[Tuple[int, int]]] = None) -> np.ndarray:
+        """
+        Return the slots of camera's zones (in the order given), creating
+        missing ones. votes gives (vote_n, vote_m) per zone.
+        """
+        votes = list(votes) if votes is not None else [(DEFAULT_VOTE_N, DEFAULT_VOTE_M)] * len(zones)
+        with self._lock:
+            slots = []
+            for zone, (vote_n, vote_m) in zip(zones, votes):
+                if 2 * vote_n <= vote_m:
+                    logger.warning(f"Zone {zone} of {camera}: vote_n {vote_n} of {vote_m} has no hysteresis")
+                key = (camera, zone)
+                slot = self._slots.get(key)
+                if slot is None:
+                    if not self._free:
+                        self._allocate(2 * len(self._keys))
+                    slot = self._free.pop()
+                    self._slots[key] = slot
+                    self._keys[slot] = key
+                    self.state[slot] = 0
+                    self.history[slot] = 0
+                    self.samples[slot] = 0
+                    self.empty_since[slot] = np.nan
+                    self.empty_pending[slot] = True
+                    self.changes[slot] = 0
+                    self.coverage[slot] = 0.0
+                self.vote_n[slot] = vote_n
+                self.vote_m[slot] = vote_m
+                slots.append(slot)
+            return np.asarray(slots, np.intp)
+
+    def unregister(self, camera: str):
+        """Free the slots of camera's zones"""
+        with self._lock:
+            for key in [key for key in self._slots if key[0] == camera]:
+                slot = self._slots.pop(key)
+                self._keys[slot] = None
+                self._free.append(slot)
+
+    def update(self, slots: np.ndarray, observed: np.ndarray, now: float, enabled: bool = True,
+               sampled: bool = True, coverage: Optional[np.ndarray] = None) -> List[ZoneEvent]:
+        """
+        Advance slots with their raw occupancy (0/1) observed at time now and
+        return the resulting events. sampled is False when observed repeats
+        an earlier detection (skipped frame): it is then not voted again.
+        coverage is the detection's area coverage of each slot, kept per slot
+        and reported with the events.
+        With enabled False (detection off) the states follow observed
+        directly, the histories are cleared and no events are produced.
+        """
+        observed = np.asarray(observed, np.int8)
+        with self._lock:
+            old = self.state[slots]
+            if coverage is not None and sampled:
+                self.coverage[slots] = coverage
+            if not enabled:
+                self.state[slots] = observed
+                self.history[slots] = 0
+                self.samples[slots] = 0
+                return []
+            new = old
+            if sampled:
+                vote_n, vote_m = self.vote_n[slots], self.vote_m[slots]
+                window = (np.uint64(1) << vote_m.astype(np.uint64)) - np.uint64(1)
+                history = ((self.history[slots] << np.uint64(1)) | observed.astype(np.uint64)) & window
+                samples = np.minimum(self.samples[slots] + 1, vote_m)
+                occupied_votes = popcount64(history)
+                empty_votes = samples - occupied_votes
+                new = np.where(occupied_votes >= vote_n, 1, np.where(empty_votes >= vote_n, 0, old)).astype(np.int8)
+                self.history[slots] = history
+                self.samples[slots] = samples
+                self.state[slots] = new
+
+            pending = self.empty_pending[slots]
+            samples = self.samples[slots]
+            voted_empty = (new == 0) & (samples - popcount64(self.history[slots]) >= self.vote_n[slots])
+            empty_since = self.empty_since[slots]
+            empty_since = np.where(pending & voted_empty & np.isnan(empty_since), now, empty_since)
+            empty_since = np.where(voted_empty, empty_since, np.nan)
+            fire_empty = pending & voted_empty & (now - empty_since >= self.empty_s)
+            self.empty_pending[slots] = pending & ~fire_empty
+            self.empty_since[slots] = np.where(fire_empty, np.nan, empty_since)
+
+            changed = new != old
+            self.changes[slots[changed]] += 1
+            events = []
+            for i in np.flatnonzero(fire_empty):
+                camera, zone = self._keys[slots[i]]
+                events.append(ZoneEvent(EVENT_EMPTY, camera, zone, int(old[i]), int(new[i]), now,
+                                        float(self.coverage[slots[i]])))
+            for i in np.flatnonzero(changed):
+                camera, zone = self._keys[slots[i]]
+                events.append(ZoneEvent(EVENT_CHANGED, camera, zone, int(old[i]), int(new[i]), now,
+                                        float(self.coverage[slots[i]])))
+            return events
+
+    def states(self, slots: np.ndarray) -> np.ndarray:
+        with self._lock:
+            return self.state[slots].copy()
+
+
+zone_state_engine = ZoneStateEngine()